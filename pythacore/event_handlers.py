@@ -1,6 +1,11 @@
 import frappe
 from frappe import _
 
+# Local imports
+from pythacore.farandsoft.item_tax import clear_item_tax_templates
+from pythacore.winbooks.doctype.winbooks_invoice_outbox.winbooks_invoice_outbox import (add_outbox_record,
+                                                                                       cancel_outbox_record)
+
 
 def before_cancel(doc, method=None):
     if doc.winbooks_sync_date is not None:
@@ -9,3 +14,24 @@ def before_cancel(doc, method=None):
             msg=_(
                 "Sorry, you can't cancel an invoice which is already synced with Winbooks.")
         )
+
+
+def add_to_winbooks_outbox(doc, method=None):
+    add_outbox_record(doc)
+
+
+def cancel_in_winbooks_outbox(doc, method=None):
+    cancel_outbox_record(doc.doctype, doc.name)
+
+
+def clear_item_tax_cache(doc, method=None):
+    clear_item_tax_templates([doc.name])
+
+
+def clear_renamed_item_tax_cache(doc, method, old, new, merge=False):
+    clear_item_tax_templates([old, new])
+
+
+def clear_all_item_tax_cache(doc, method=None, *args, **kwargs):
+    # Templates are referenced by name in the cache.
+    clear_item_tax_templates()
@@ -0,0 +1,37 @@
+import frappe
+
+# Redis hash caching the codes of master data, by doctype and code field.
+CODE_MAPS_KEY = 'pythacore_code_maps'
+
+
+def get_code_map(doctype, field='fs_code') -> dict:
+    """Return the `field` code of every record of `doctype`, by name.
+
+    Meant for small master data such as territories. The map is cached in Redis, and kept
+    in the memory of the request by `frappe.cache()`, until `clear_code_maps` is called.
+    """
+    cache = frappe.cache()
+    key = get_code_map_key(doctype, field)
+    codes = cache.hget(CODE_MAPS_KEY, key)
+
+    if codes is None:
+        codes = dict(frappe.db.get_all(doctype, fields=['name', field], as_list=True))
+        cache.hset(CODE_MAPS_KEY, key, codes)
+
+    return codes
+
+
+def clear_code_maps(doctype) -> None:
+    """Remove the code maps of `doctype` from the cache."""
+    cache = frappe.cache()
+    prefix = get_code_map_key(doctype, '')
+
+    for key in cache.hkeys(CODE_MAPS_KEY):
+        key = frappe.safe_decode(key)
+
+        if key.startswith(prefix):
+            cache.hdel(CODE_MAPS_KEY, key)
+
+
+def get_code_map_key(doctype, field) -> str:
+    return f'{doctype}:{field}'
@@ -125,9 +125,89 @@ frappe.ui.form.on('Farandsoft Synchronisation', {
 	},
 
 	show_sync_details(frm) {
+		frm.toggle_display('sync_details_section', false);
+		frm.get_field('sync_log_preview').$wrapper.empty();
+
+		if (frm.is_new() || frm.doc.status === 'Pending') return;
+
+		frm.sync_ledger = { start: 0, status: '' };
+		frm.events.load_sync_ledger(frm);
+	},
+
+	// The ledger is loaded page by page from the server instead of rendering every
+	// synchronised document at once.
+	load_sync_ledger(frm) {
+		frappe
+			.call({
+				method: 'pythacore.pythacore.doctype.sync_ledger.sync_ledger.get_sync_ledger',
+				args: {
+					sync_doctype: frm.doctype,
+					sync_name: frm.doc.name,
+					status: frm.sync_ledger.status,
+					start: frm.sync_ledger.start,
+					page_length: 100
+				}
+			})
+			.then(r => {
+				let { entries, total } = r.message;
+
+				// Synchronisations made before the ledger existed only have a JSON log.
+				if (total === 0 && frm.sync_ledger.start === 0 && !frm.sync_ledger.status && frm.doc.sync_log) {
+					frm.events.show_legacy_sync_log(frm);
+					return;
+				}
+
+				if (frm.sync_ledger.start === 0) {
+					frm.events.render_sync_ledger(frm, total);
+				}
+
+				frm.sync_ledger.start += entries.length;
+
+				let $wrapper = frm.get_field('sync_log_preview').$wrapper;
+				$wrapper.find('.sync-ledger-rows').append(entries.map(log => frm.events.get_sync_ledger_row(frm, log)).join(''));
+				$wrapper.find('.sync-ledger-more').toggle(frm.sync_ledger.start < total);
+			});
+	},
+
+	render_sync_ledger(frm, total) {
+		frm.toggle_display('sync_details_section', total > 0 || !!frm.sync_ledger.status);
+
+		let statuses = ['', 'Success', 'Error']
+			.map(status => `<option value="${status}" ${status === frm.sync_ledger.status ? 'selected' : ''}>
+				${status ? __(status) : __('All')}
+			</option>`)
+			.join('');
+
+		let $wrapper = frm.get_field('sync_log_preview').$wrapper;
+		$wrapper.html(`
+			<div class="form-group" style="max-width: 200px;">
+				<select class="form-control input-xs sync-ledger-status">${statuses}</select>
+			</div>
+			<table class="table table-bordered">
+				<thead>
+					<tr class="text-muted">
+						<th width="10%">${__('Document')}</th>
+						<th width="15%">${__('Reference')}</th>
+						<th width="10%">${__('Status')}</th>
+						<th width="65%">${__('Message')}</th>
+					</tr>
+				</thead>
+				<tbody class="sync-ledger-rows"></tbody>
+			</table>
+			<button class="btn btn-default btn-xs sync-ledger-more">${__('Load More')}</button>
+		`);
+
+		$wrapper.find('.sync-ledger-status').on('change', e => {
+			frm.sync_ledger = { start: 0, status: $(e.target).val() };
+			frm.events.load_sync_ledger(frm);
+		});
+		$wrapper.find('.sync-ledger-more').on('click', () => frm.events.load_sync_ledger(frm));
+	},
+
+	show_legacy_sync_log(frm) {
 		let sync_log = JSON.parse(frm.doc.sync_log || '[]');
 		let logs = sync_log;
-		frm.toggle_display('sync_details_section', (frm.doc.status !== 'Pending' && logs.length > 0));
+		frm.toggle_display('sync_details_section', logs.length > 0);
 
 		if (logs.length === 0) {
 			frm.get_field('sync_log_preview').$wrapper.empty();
@@ -135,26 +215,12 @@ frappe.ui.form.on('Farandsoft Synchronisation', {
 		}
 
 		let rows = logs
-			.map(log => {
-				let indicator_color = 'gray';
-				if (log.status === 'Success') indicator_color = 'green';
-				else if (log.status === 'Error') indicator_color = 'red';
-
-				let title = __('Pending');
-				if (log.status === 'Success') title = __('Success');
-				else if (log.status === 'Error') title = __('Error');
-
-				return `<tr>
-					<td>${log.doctype}</td>
-					<td>${log.reference}</td>
-					<td>
-						<div class="indicator ${indicator_color}">${title}</div>
-					</td>
-					<td>
-						${log.msg}
-					</td>
-				</tr>`;
-			})
+			.map(log => frm.events.get_sync_ledger_row(frm, {
+				status: log.status,
+				reference_doctype: log.doctype,
+				reference: log.reference,
+				message: log.msg
+			}))
 			.join('');
 
 		frm.get_field('sync_log_preview').$wrapper.html(`
@@ -169,4 +235,25 @@ frappe.ui.form.on('Farandsoft Synchronisation', {
 			</table>
 		`);
 	},
+
+	get_sync_ledger_row(frm, log) {
+		let indicator_color = 'gray';
+		if (log.status === 'Success') indicator_color = 'green';
+		else if (log.status === 'Error') indicator_color = 'red';
+
+		let title = __('Pending');
+		if (log.status === 'Success') title = __('Success');
+		else if (log.status === 'Error') title = __('Error');
+
+		return `<tr>
+			<td>${log.reference_doctype}</td>
+			<td>${log.reference}</td>
+			<td>
+				<div class="indicator ${indicator_color}">${title}</div>
+			</td>
+			<td>
+				${log.message ?? ''}
+			</td>
+		</tr>`;
+	},
 });
@@ -3,7 +3,6 @@
 # For license information, please see license.txt
 
 # System imports
-import json
 import traceback
 
 # Frappe imports
@@ -17,7 +16,21 @@ from frappe.utils.background_jobs import enqueue
 from erpnext.stock.get_item_details import apply_price_list
 
 # Local imports
+from pythacore.metrics import measure_phase
+from pythacore.pythacore.doctype.sync_callback.sync_callback import (delete_sync_callbacks, queue_sync_callback,
+                                                                     should_defer)
+from pythacore.pythacore.doctype.sync_ledger.sync_ledger import delete_ledger_entries, set_ledger_entries
+from pythacore.farandsoft.codes import get_code_map
+from pythacore.farandsoft.item_tax import get_item_tax_templates
+from pythacore.party import ADDRESS_FIELDS, set_addresses_and_contacts
+from pythacore.utils import (SYNC_JOB_TIMEOUT, acquire_sync_lock, acquire_sync_slot, decode_cursor, encode_cursor,
+                             get_page, get_page_length, get_sync_queue, get_sync_slot_holder, release_sync_lock,
+                             release_sync_slot, remove_fields, with_extra_fields)
 from pythacore.farandsoft.doctype.farandsoft_synchronisation.sync_job import SyncJob
+from pythacore.wire import get_request_body, make_response, read_payload
+
+# How many Sales Orders of a batch are created between two commits.
+SALES_ORDER_COMMIT_SIZE = 50
 
 
 class FarandsoftSynchronisation(Document):
@@ -32,8 +45,11 @@ class FarandsoftSynchronisation(Document):
             set_name=f"Synchronisation on {date} at {time}", force=True)
         self.sync_datetime = now
 
+    def on_trash(self):
+        delete_ledger_entries(self.doctype, self.name)
+        delete_sync_callbacks(self.doctype, self.name)
+
     def queue_sync_job(self):
-        from frappe.core.page.background_jobs.background_jobs import get_info
         from frappe.utils.scheduler import is_scheduler_inactive
 
         pythacore_online = frappe.cache().get('pythacore_online')
@@ -48,21 +64,25 @@ class FarandsoftSynchronisation(Document):
                 _("Could not connect to PythaCore. Cannot start synchronisation."), title=_("PythaCore Offline")
             )
 
-        enqueued_jobs = [d.get("job_name") for d in get_info()]
+        # The lock is released by `start_sync_job` once the job is done.
+        if not acquire_sync_lock(self.name):
+            return False
 
-        if self.name not in enqueued_jobs:
+        try:
             enqueue(
                 start_sync_job,
-                queue="default",
-                timeout=6000,
+                queue=get_sync_queue(),
+                timeout=SYNC_JOB_TIMEOUT,
                 event="farandsoft_sync",
                 job_name=self.name,
                 sync_doc_name=self.name,
-                now=True,
+                now=frappe.conf.developer_mode or frappe.flags.in_test,
             )
-            return True
+        except Exception:
+            release_sync_lock(self.name)
+            raise
 
-        return False
+        return True
 
 
 def start_sync_job(sync_doc_name):
@@ -72,11 +92,20 @@ def start_sync_job(sync_doc_name):
     if sync_doc.status == 'Error':
         sync_doc.db_set('error_message', None)
 
+    slot_holder = get_sync_slot_holder("Farandsoft Synchronisation", sync_doc_name)
+
     try:
+        # Limit how many synchronisations run at the same time. The slot is held until
+        # PythaCore sends the results, it is released once they are processed.
+        if not acquire_sync_slot(slot_holder):
+            frappe.throw(_('Too many synchronisations are running. Please try again later.'),
+                         title=_('Synchronisation Busy'))
+
         worker = SyncJob(sync_doc)
         worker.sync()
     except Exception as e:
         frappe.db.rollback()
+        release_sync_slot(slot_holder)
         sync_doc.db_set("status", "Error")
         sync_doc.db_set('error_message', e)
         print(traceback.print_exc())
@@ -85,6 +114,8 @@ def start_sync_job(sync_doc_name):
             'farandsoft_sync_refresh',
             {'sync_doc_name': sync_doc.name}
         )
+    finally:
+        release_sync_lock(sync_doc_name)
 
 
 @frappe.whitelist()
@@ -93,41 +124,61 @@ def form_start_sync(sync_doc_name):
 
 
 @frappe.whitelist()
-def set_status(sync_doc_name) -> None:
-    results = json.loads(frappe.request.data)
-    errors = results['errors']
-    successes = results['successes']
-    error_message = results['error_message']
-    doc = frappe.get_doc('Farandsoft Synchronisation', sync_doc_name)
+def set_status(sync_doc_name, defer=None) -> None:
+    if should_defer(defer):
+        queue_sync_callback('Farandsoft Synchronisation', sync_doc_name,
+                            f'{__name__}.process_status', get_request_body())
+        return
+
+    process_status(sync_doc_name, read_payload())
+
+def process_status(sync_doc_name, results) -> None:
+    with measure_phase('Farandsoft Synchronisation', sync_doc_name, 'set_status') as metrics:
+        errors = results['errors']
+        successes = results['successes']
+        error_message = results['error_message']
+        doc = frappe.get_doc('Farandsoft Synchronisation', sync_doc_name)
+
+        if len(successes) > 0 and len(errors) > 0:
+            frappe.db.set_value('Farandsoft Synchronisation',
+                                sync_doc_name, 'status', 'Partial')
+        elif len(errors) > 0:
+            frappe.db.set_value('Farandsoft Synchronisation',
+                                sync_doc_name, 'status', 'Error')
+        elif doc.error_message is not None:
+            frappe.db.set_value('Farandsoft Synchronisation',
+                                sync_doc_name, 'status', 'Partial')
+        else:
+            frappe.db.set_value('Farandsoft Synchronisation',
+                                sync_doc_name, 'status', 'Success')
+
+        set_ledger_entries('Farandsoft Synchronisation', sync_doc_name,
+                           [get_ledger_entry(log) for log in errors + successes])
+
+        if error_message is not None and error_message != '':
+            frappe.db.set_value('Farandsoft Synchronisation',
+                                sync_doc_name, 'status', 'Error')
+            frappe.db.set_value('Farandsoft Synchronisation',
+                                sync_doc_name, 'error_message', error_message)
+
+        frappe.db.commit()
+        # The synchronisation is over, let another one start.
+        release_sync_slot(get_sync_slot_holder('Farandsoft Synchronisation', sync_doc_name))
 
-    if len(successes) > 0 and len(errors) > 0:
-        frappe.db.set_value('Farandsoft Synchronisation',
-                            sync_doc_name, 'status', 'Partial')
-    elif len(errors) > 0:
-        frappe.db.set_value('Farandsoft Synchronisation',
-                            sync_doc_name, 'status', 'Error')
-    elif doc.error_message is not None:
-        frappe.db.set_value('Farandsoft Synchronisation',
-                            sync_doc_name, 'status', 'Partial')
-    else:
-        frappe.db.set_value('Farandsoft Synchronisation',
-                            sync_doc_name, 'status', 'Success')
-
-    frappe.db.set_value('Farandsoft Synchronisation',
-                        sync_doc_name, 'sync_log', json.dumps(errors + successes))
-
-    if error_message is not None and error_message != '':
-        frappe.db.set_value('Farandsoft Synchronisation',
-                            sync_doc_name, 'status', 'Error')
-        frappe.db.set_value('Farandsoft Synchronisation',
-                            sync_doc_name, 'error_message', error_message)
+        frappe.publish_realtime(
+            'farandsoft_sync_refresh',
+            {'sync_doc_name': sync_doc_name}
+        )
 
-    frappe.db.commit()
+        metrics.documents = len(errors) + len(successes)
 
-    frappe.publish_realtime(
-        'farandsoft_sync_refresh',
-        {'sync_doc_name': sync_doc_name}
-    )
+def get_ledger_entry(log) -> dict:
+    return {
+        'status': log.get('status'),
+        'reference_doctype': log.get('doctype'),
+        'reference': log.get('reference'),
+        'message': log.get('msg')
+    }
 
 @frappe.whitelist()
 def append_error(sync_doc_name, error_message) -> None:
@@ -144,41 +195,212 @@ def append_error(sync_doc_name, error_message) -> None:
 
 # We need a custom method in order to fetch linked docs such as the customer's addresses
 @frappe.whitelist()
-def get_all_customers(fields, filters, limit_page_length):
-    customers = frappe.db.get_all('Customer', fields=fields, filters=filters, page_length=limit_page_length)
+def get_all_customers(fields, filters, limit_page_length, sync_doc_name=None):
+    with measure_phase('Farandsoft Synchronisation', sync_doc_name, 'get_all_customers') as metrics:
+        customers = frappe.db.get_all('Customer', fields=fields, filters=filters, page_length=limit_page_length)
 
-    for customer in customers:
-        links = frappe.db.get_all('Dynamic Link', { 'link_doctype': 'Customer', 'link_name': customer['name'], 'parenttype': 'Address' }, ['parent'])
-        
         if 'territory' in fields:
-            customer['territory_fs_code'] = frappe.db.get_value('Territory', customer['territory'], 'fs_code')
+            territory_codes = get_code_map('Territory')
+
+            for customer in customers:
+                customer['territory_fs_code'] = territory_codes.get(customer['territory'])
+
+        set_addresses_and_contacts(customers, 'Customer', with_contacts=False)
 
-        customer.addresses = []
+        metrics.documents = len(customers)
 
-        for link in links:
-            address = frappe.db.get_value("Address", link['parent'], fieldname=['name', 'address_line1', 'address_line2', 'city', 'pincode', 'country', 'address_type', 'fs_code'], as_dict=True)
-            address['customer'] = customer['name']
-            customer.addresses.append(address)
-    
-    return customers
+    return make_response(customers)
 
 @frappe.whitelist()
-def get_all_customer_addresses():
-    links = frappe.db.get_all('Dynamic Link', { 'link_doctype': 'Customer', 'parenttype': 'Address' }, ['parent', 'link_name'])
+def get_all_customer_addresses(modified_since=None, sync_doc_name=None):
+    with measure_phase('Farandsoft Synchronisation', sync_doc_name, 'get_all_customer_addresses') as metrics:
+        addresses = get_customer_addresses(modified_since)
+        remove_fields(addresses, ['cursor_modified', 'cursor_name'])
+
+        metrics.documents = len(addresses)
+
+    return make_response(addresses)
+
+@frappe.whitelist()
+def get_all_customers_page(fields, filters, cursor=None, page_length=None, sync_doc_name=None):
+    """Paginated variant of `get_all_customers`, see `pythacore.utils.get_page`."""
+    with measure_phase('Farandsoft Synchronisation', sync_doc_name, 'get_all_customers') as metrics:
+        fields, added_fields = with_extra_fields(fields, ['name'])
+        customers, next_cursor = get_page('Customer', fields, filters, cursor, page_length)
+
+        if 'territory' in fields:
+            territory_codes = get_code_map('Territory')
+
+            for customer in customers:
+                customer['territory_fs_code'] = territory_codes.get(customer['territory'])
 
-    addresses = []
+        set_addresses_and_contacts(customers, 'Customer', with_contacts=False)
+        remove_fields(customers, added_fields)
 
-    for link in links:
-        address = frappe.db.get_value("Address", link['parent'], fieldname=['name', 'address_line1', 'address_line2', 'city', 'pincode', 'country', 'address_type', 'fs_code'], as_dict=True)
-        address['customer'] = link['link_name']
-        addresses.append(address)
+        metrics.documents = len(customers)
 
-    return addresses
+    return make_response({'data': customers, 'cursor': next_cursor})
+
+@frappe.whitelist()
+def get_all_customer_addresses_page(cursor=None, page_length=None, modified_since=None, sync_doc_name=None):
+    """Paginated variant of `get_all_customer_addresses`, see `pythacore.utils.get_page`.
+
+    Addresses are ordered by their `modified` date and name. A page holds `page_length`
+    addresses, and an address linked to several customers is returned once per customer,
+    all in the same page.
+    """
+    with measure_phase('Farandsoft Synchronisation', sync_doc_name, 'get_all_customer_addresses') as metrics:
+        page_length = get_page_length(page_length)
+        after = decode_cursor(cursor) if cursor else None
+        addresses = get_customer_addresses(modified_since, after, page_length)
+        next_cursor = None
+
+        if len({address['cursor_name'] for address in addresses}) == page_length:
+            next_cursor = encode_cursor(addresses[-1]['cursor_modified'], addresses[-1]['cursor_name'])
+
+        remove_fields(addresses, ['cursor_modified', 'cursor_name'])
+
+        metrics.documents = len(addresses)
+
+    return make_response({'data': addresses, 'cursor': next_cursor})
+
+def get_customer_addresses(modified_since=None, after=None, limit=None) -> list:
+    """Return the addresses of the customers, with the customer, in one joined query.
+
+    Only the addresses modified since `modified_since` are returned if it is set. With a
+    `limit`, a page of `limit` addresses is selected on the Address table alone, sorted by
+    (`modified`, name) and starting after the `after` position, so that the `modified`
+    index serves it. Each address is then returned once per customer it is linked to.
+    Each address also holds these two values as `cursor_modified`/`cursor_name`.
+    """
+    columns = ', '.join(f'address.{field}' for field in ADDRESS_FIELDS)
+    values = {}
+
+    if not limit:
+        conditions = ["link.link_doctype = 'Customer'", "link.parenttype = 'Address'"]
+
+        if modified_since:
+            conditions.append('address.modified >= %(modified_since)s')
+            values['modified_since'] = modified_since
+
+        return frappe.db.sql(f"""
+            select {columns}, link.link_name as customer,
+                address.modified as cursor_modified, address.name as cursor_name
+            from `tabDynamic Link` link
+            inner join `tabAddress` address on address.name = link.parent
+            where {' and '.join(conditions)}
+            order by link.modified desc
+        """, values, as_dict=True)
+
+    conditions = ["""exists (
+        select 1
+        from `tabDynamic Link` customer_link
+        where customer_link.parent = page_address.name
+            and customer_link.parenttype = 'Address'
+            and customer_link.link_doctype = 'Customer'
+    )"""]
+    values['limit'] = limit
+
+    if modified_since:
+        conditions.append('page_address.modified >= %(modified_since)s')
+        values['modified_since'] = modified_since
+
+    if after:
+        # (modified, name) > (after modified, after name)
+        conditions.append('page_address.modified >= %(after_modified)s')
+        conditions.append('(page_address.modified > %(after_modified)s or page_address.name > %(after_name)s)')
+        values['after_modified'], values['after_name'] = after
+
+    return frappe.db.sql(f"""
+        select {columns}, link.link_name as customer,
+            address.modified as cursor_modified, address.name as cursor_name
+        from (
+            select page_address.name
+            from `tabAddress` page_address
+            where {' and '.join(conditions)}
+            order by page_address.modified asc, page_address.name asc
+            limit %(limit)s
+        ) page
+        inner join `tabAddress` address on address.name = page.name
+        inner join `tabDynamic Link` link on link.parent = address.name
+        where link.link_doctype = 'Customer' and link.parenttype = 'Address'
+        order by address.modified asc, address.name asc, link.name asc
+    """, values, as_dict=True)
 
 @frappe.whitelist()
 def create_sales_order():
-    data = json.loads(frappe.request.data)
+    data = read_payload()
+
+    make_sales_order(data, get_sales_order_lookups([data]))
+
+@frappe.whitelist()
+def create_sales_orders():
+    """Create a batch of Sales Orders and return the result of each one, in the same order.
+
+    The lookups shared by the orders are resolved once for the whole batch. Each order is
+    created in its own savepoint so that a bad order is rolled back alone, and the batch
+    is committed every `SALES_ORDER_COMMIT_SIZE` orders.
+    """
+    orders = read_payload()
+    lookups = get_sales_order_lookups(orders)
+    results = []
+
+    for idx, data in enumerate(orders):
+        if not isinstance(data, dict):
+            data = {}
+
+        result = {'name': data.get('name'), 'fs_reference': data.get('fs_reference')}
+        frappe.db.savepoint('sales_order')
+
+        try:
+            so = make_sales_order(data, lookups)
+            result['name'] = so.name
+            result['status'] = 'Success'
+        except Exception as e:
+            frappe.db.rollback(save_point='sales_order')
+            # The error is returned with the result of the order, not as a server message.
+            frappe.clear_messages()
+            result['status'] = 'Error'
+            result['message'] = str(e)
+
+        results.append(result)
+
+        if (idx + 1) % SALES_ORDER_COMMIT_SIZE == 0:
+            frappe.db.commit()
+
+    frappe.db.commit()
+
+    return make_response(results)
 
+def get_sales_order_lookups(orders) -> frappe._dict:
+    """Fetch the data shared by the given orders: customers, sales partners and item taxes.
+
+    Malformed orders and items are skipped here, their errors are raised by
+    `make_sales_order` and returned with the result of the order.
+    """
+    orders = [order for order in orders if isinstance(order, dict)]
+    customers = {order['customer'] for order in orders if order.get('customer')}
+    sales_partners = {order['sales_partner'] for order in orders if order.get('sales_partner')}
+    item_codes = {item['item_code'] for order in orders for item in order.get('items') or []
+                  if isinstance(item, dict) and item.get('item_code')}
+
+    lookups = frappe._dict({
+        'customers': {},
+        'commission_rates': {}
+    })
+
+    for customer in frappe.db.get_all('Customer', filters={'name': ['in', list(customers)]}, fields=['name', 'tax_category', 'default_price_list']):
+        lookups.customers[customer['name']] = customer
+
+    if len(sales_partners) > 0:
+        for sales_partner in frappe.db.get_all('Sales Partner', filters={'name': ['in', list(sales_partners)]}, fields=['name', 'commission_rate']):
+            lookups.commission_rates[sales_partner['name']] = sales_partner['commission_rate']
+
+    lookups.item_tax_templates = get_item_tax_templates(item_codes)
+
+    return lookups
+
+def make_sales_order(data, lookups):
     so = frappe.new_doc('Sales Order')
     args = frappe._dict(data)
 
@@ -192,36 +414,33 @@ def create_sales_order():
     so.shipping_address_name = args.shipping_address_name
     so.customer_address = args.customer_address
 
-    customer_tax_cat = frappe.db.get_value('Customer', so.customer, 'tax_category')
+    customer = lookups.customers.get(so.customer) or frappe._dict()
+    customer_tax_cat = customer.get('tax_category')
 
     for item in args['items']:
-        try:
-            it = frappe.get_last_doc('Item Tax', filters={'parent': item['item_code'], 'tax_category': customer_tax_cat, 'scope': 'Sales'})
+        item_tax_template = lookups.item_tax_templates.get((item['item_code'], customer_tax_cat or '', 'Sales'))
 
-            if it is not None:
-                item['item_tax_template'] = it.item_tax_template
-        except:
-            pass
+        if item_tax_template is not None:
+            item['item_tax_template'] = item_tax_template
 
         so.append('items', item)
 
     for tax in args['taxes']:
         so.append('taxes', tax)
 
-    customer_price_list = frappe.db.get_value('Customer', so.customer, 'default_price_list')
+    customer_price_list = customer.get('default_price_list')
     if customer_price_list is not None:
         so.selling_price_list = customer_price_list
 
     if so.sales_partner is not None:
-        so.commission_rate = frappe.db.get_value('Sales Partner', so.sales_partner, 'commission_rate')
+        so.commission_rate = lookups.commission_rates.get(so.sales_partner)
         so.calculate_commission()
 
-    so.calculate_taxes_and_totals()
-    so.insert()
-
-    # We must update the item prices after inserting the new Sales Order then save because of
-    # the `apply_price_list` method.
+    # We resolve the item prices of the price list before inserting the Sales Order so that
+    # it is only written once. `apply_price_list` needs the currency and conversion rates,
+    # which are set by `set_missing_values` as they would be when validating the order.
     if customer_price_list is not None:
+        so.set_missing_values(for_validate=True)
         updated_so = apply_price_list(so.as_dict(), as_doc=True)
         so.delete_key('items')
 
@@ -229,4 +448,7 @@ def create_sales_order():
             item['rate'] = item['price_list_rate'] # we must manually update the item rate
             so.append('items', item)
 
-        so.save()
\ No newline at end of file
+    so.calculate_taxes_and_totals()
+    so.insert()
+
+    return so
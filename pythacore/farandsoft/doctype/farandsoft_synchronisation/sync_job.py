@@ -1,8 +1,8 @@
 from __future__ import unicode_literals
 
 # System imports
-import redis
 import json
+import time
 from decimal import Decimal
 
 # Local imports
@@ -10,6 +10,9 @@ import frappe
 from datetime import datetime, date
 from frappe import _
 from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
+from pythacore.metrics import measure_phase
+from pythacore.utils import (PROGRESS_PUBLISH_INTERVAL, get_redis_connection, get_sync_filters,
+                             increment_progress, set_progress)
 
 
 class SyncJob:
@@ -18,16 +21,19 @@ class SyncJob:
         self.console = console
         self.listeners = {}
         self.documents = []
-        self.redis = redis.Redis.from_url('redis://127.0.0.1:13000')
+        self.redis = get_redis_connection()
+        self.progress_message = None
+        self.progress_published_at = 0
         self.purchase_invoices = {'count': 0, 'range': ''}
         self.sales_invoices = {'count': 0, 'range': ''}
         self.customers = {'count': 0, 'range': ''}
         self.suppliers = {'count': 0, 'range': ''}
 
     def sync(self):
-        self.set_status('In Progress')
-        self.init_progress()
-        self.send_start_sync()
+        with measure_phase('Farandsoft Synchronisation', self.sync_doc.name, 'start'):
+            self.set_status('In Progress')
+            self.init_progress()
+            self.send_start_sync()
 
     def send_start_sync(self) -> None:
         frappe.publish_realtime(
@@ -52,37 +58,23 @@ class SyncJob:
     def init_progress(self) -> None:
         self.cache_progress(0, 0)
 
-    # We convert the integer params to strings so that we can easily decode them
-    # when we will fetch them because redis stores data in binary format.
     def cache_progress(self, current: int, total: int = None) -> None:
-        self.redis.hset(
-            self.sync_doc.name,
-            'progress_current',
-            str(current)
-        )
-
-        if total is not None:
-            self.redis.hset(
-                self.sync_doc.name,
-                'progress_total',
-                str(total)
-            )
+        set_progress(self.redis, self.sync_doc.name, current, total)
 
     def update_progress(self, step: int = 1, message: str = '') -> None:
-        total = self.redis.hget(
-            self.sync_doc.name,
-            'progress_total'
-        )
-        current = self.redis.hget(
-            self.sync_doc.name,
-            'progress_current'
-        )
+        current, total = increment_progress(
+            self.redis, self.sync_doc.name, step)
+
+        # Fine-grained steps would flood the socket.io channel, so an update with the same
+        # message as the previous one is only published once in a while.
+        now = time.monotonic()
 
-        total = int(total)
-        current = int(current)
-        current += step
+        if message == self.progress_message and current < total \
+                and now - self.progress_published_at < PROGRESS_PUBLISH_INTERVAL:
+            return
 
-        self.cache_progress(current)
+        self.progress_message = message
+        self.progress_published_at = now
 
         frappe.publish_realtime(
             event='farandsoft_sync_progress',
@@ -104,7 +96,7 @@ class SyncJob:
         doc_list = frappe.get_all(
             doctype,
             fields=get_fields_for(doctype),
-            filters=get_filters_for(doctype)
+            filters=get_sync_filters(doctype, get_filters_for(doctype))
         )
 
         for doc_info in doc_list:
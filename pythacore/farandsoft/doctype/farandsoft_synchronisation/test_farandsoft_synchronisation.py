@@ -1,8 +1,75 @@
 # Copyright (c) 2021, Kano Solutions and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 import unittest
+from frappe.utils import add_days, now_datetime
 
-class TestFarandsoftSynchronisation(unittest.TestCase):
-	pass
+from pythacore.farandsoft.doctype.farandsoft_synchronisation import farandsoft_synchronisation
+from pythacore.tests.benchmark import call_with_request
+from pythacore.tests.synthetic_data import create_sync_doc, create_synthetic_data, delete_synthetic_data
+from pythacore.tests.utils import LARGE_SCALE, SMALL_SCALE, QueryBudgetMixin, get_filters
+
+TEST_PREFIX = 'PYTHATEST-FS'
+
+class TestFarandsoftSynchronisation(QueryBudgetMixin, unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		delete_synthetic_data(TEST_PREFIX)
+		cls.started_at = now_datetime()
+		cls.data = create_synthetic_data(LARGE_SCALE, TEST_PREFIX)
+		cls.sync_doc_name = create_sync_doc(TEST_PREFIX, 'Farandsoft Synchronisation')
+
+	@classmethod
+	def tearDownClass(cls):
+		frappe.db.rollback()
+		delete_synthetic_data(TEST_PREFIX)
+
+	def test_get_all_customers_query_budget(self):
+		fields = ['name', 'customer_name', 'territory']
+
+		self.assertNamesQueryBudget(lambda names: farandsoft_synchronisation.get_all_customers(
+			fields, get_filters(names), 0), self.data.customers)
+		self.assertNamesQueryBudget(lambda names: farandsoft_synchronisation.get_all_customers_page(
+			fields, get_filters(names), page_length=len(names)), self.data.customers)
+
+	def test_get_all_customer_addresses_query_budget(self):
+		# Nothing was modified after tomorrow, while every synthetic address was modified
+		# after the start of the test.
+		self.assertQueryBudget(lambda modified_since: farandsoft_synchronisation.get_all_customer_addresses(
+			modified_since=modified_since), add_days(self.started_at, 1), self.started_at)
+		self.assertQueryBudget(lambda page_length: farandsoft_synchronisation.get_all_customer_addresses_page(
+			page_length=page_length, modified_since=self.started_at), SMALL_SCALE, LARGE_SCALE)
+
+	def test_set_status_query_budget(self):
+		def set_status(names):
+			successes = [{'doctype': 'Customer', 'reference': name, 'status': 'Success'} for name in names]
+			call_with_request(farandsoft_synchronisation.set_status, {
+				'errors': [],
+				'successes': successes,
+				'error_message': None
+			}, sync_doc_name=self.sync_doc_name, defer=0)
+
+		self.assertNamesQueryBudget(set_status, self.data.customers)
+
+	def test_sales_order_lookups_query_budget(self):
+		def get_sales_order_lookups(names):
+			return farandsoft_synchronisation.get_sales_order_lookups([{
+				'customer': name,
+				'items': [{'item_code': f'{TEST_PREFIX}-ITEM-{idx}'} for idx in range(3)]
+			} for name in names])
+
+		self.assertNamesQueryBudget(get_sales_order_lookups, self.data.customers)
+
+	def test_create_sales_orders_malformed_order(self):
+		# A malformed order fails alone, with its own result, instead of failing the batch.
+		orders = [
+			{'name': f'{TEST_PREFIX}-SO-1', 'items': [{'qty': 1}]},
+			{'name': f'{TEST_PREFIX}-SO-2', 'customer': self.data.customers[0]},
+			'not an order'
+		]
+		results = call_with_request(farandsoft_synchronisation.create_sales_orders, orders)
+		frappe.db.rollback()
+
+		self.assertEqual(len(results), len(orders))
+		self.assertTrue(all(result['status'] == 'Error' for result in results))
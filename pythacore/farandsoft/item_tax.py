@@ -0,0 +1,65 @@
+import frappe
+
+# Local imports
+from pythacore.utils import chunk
+
+# Redis hash caching the item tax templates, by item code.
+ITEM_TAX_TEMPLATES_KEY = 'pythacore_item_tax_templates'
+
+
+def get_item_tax_templates(item_codes) -> dict:
+    """Return the item tax templates of the given items, by (item code, tax category, scope).
+
+    Templates are cached in Redis by item, and kept in the memory of the request by
+    `frappe.cache()`. The items missing from the cache are loaded in one query and cached,
+    including the ones without templates, so that they are not looked up again.
+    """
+    cache = frappe.cache()
+    templates = {}
+    missing_item_codes = []
+
+    for item_code in set(item_codes):
+        item_templates = cache.hget(ITEM_TAX_TEMPLATES_KEY, item_code)
+
+        if item_templates is None:
+            missing_item_codes.append(item_code)
+        else:
+            templates.update(item_templates)
+
+    if len(missing_item_codes) > 0:
+        loaded_templates = load_item_tax_templates(missing_item_codes)
+
+        for item_code in missing_item_codes:
+            item_templates = loaded_templates.get(item_code, {})
+            cache.hset(ITEM_TAX_TEMPLATES_KEY, item_code, item_templates)
+            templates.update(item_templates)
+
+    return templates
+
+
+def load_item_tax_templates(item_codes) -> dict:
+    templates = {}
+
+    for item_codes_chunk in chunk(item_codes):
+        # Rows are sorted by creation so that the last created row wins, as with
+        # `frappe.get_last_doc`.
+        item_taxes = frappe.db.get_all('Item Tax', filters={
+            'parenttype': 'Item',
+            'parent': ['in', item_codes_chunk]
+        }, fields=['parent', 'tax_category', 'scope', 'item_tax_template'], order_by='creation asc')
+
+        for item_tax in item_taxes:
+            key = (item_tax['parent'], item_tax['tax_category'] or '', item_tax['scope'] or '')
+            templates.setdefault(item_tax['parent'], {})[key] = item_tax['item_tax_template']
+
+    return templates
+
+
+def clear_item_tax_templates(item_codes=None) -> None:
+    """Remove the given items, or all of them, from the cache."""
+    if item_codes is None:
+        frappe.cache().delete_key(ITEM_TAX_TEMPLATES_KEY)
+        return
+
+    for item_code in item_codes:
+        frappe.cache().hdel(ITEM_TAX_TEMPLATES_KEY, item_code)
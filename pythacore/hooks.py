@@ -67,6 +67,8 @@ doctype_list_js = {
 # before_install = "pythacore.install.before_install"
 # after_install = "pythacore.install.after_install"
 
+after_migrate = ["pythacore.indexes.check_sync_indexes"]
+
 # Desk Notifications
 # ------------------
 # See frappe.core.notifications.get_notification_config
@@ -110,9 +112,22 @@ override_doctype_class = {
 doc_events = {
     "Sales Invoice": {
         "before_cancel": "pythacore.event_handlers.before_cancel",
+        "on_submit": "pythacore.event_handlers.add_to_winbooks_outbox",
+        "on_cancel": "pythacore.event_handlers.cancel_in_winbooks_outbox",
     },
     "Purchase Invoice": {
         "before_cancel": "pythacore.event_handlers.before_cancel",
+        "on_submit": "pythacore.event_handlers.add_to_winbooks_outbox",
+        "on_cancel": "pythacore.event_handlers.cancel_in_winbooks_outbox",
+    },
+    "Item": {
+        "on_update": "pythacore.event_handlers.clear_item_tax_cache",
+        "on_trash": "pythacore.event_handlers.clear_item_tax_cache",
+        "after_rename": "pythacore.event_handlers.clear_renamed_item_tax_cache",
+    },
+    "Item Tax Template": {
+        "on_trash": "pythacore.event_handlers.clear_all_item_tax_cache",
+        "after_rename": "pythacore.event_handlers.clear_all_item_tax_cache",
     }
 }
 
@@ -0,0 +1,44 @@
+import frappe
+
+# Indexes on the columns the synchronisations filter and look up on, by doctype. Some of
+# these columns are custom fields, their indexes are only added where they exist.
+# The `winbooks_sync_date` indexes serve `winbooks_sync_date is null`, which is how
+# `pythacore.utils.get_sync_filters` writes the `not set` filters of the exports.
+SYNC_INDEXES = [
+    ('Sales Invoice', ['winbooks_sync_date', 'status']),
+    ('Purchase Invoice', ['winbooks_sync_date', 'status']),
+    ('Customer', ['winbooks_sync_date', 'disabled']),
+    ('Supplier', ['winbooks_sync_date', 'disabled']),
+    ('Dynamic Link', ['link_doctype', 'link_name', 'parenttype']),
+    ('Address', ['fs_code']),
+    ('Territory', ['fs_code'])
+]
+
+
+def add_sync_indexes() -> None:
+    for doctype, columns in get_applicable_indexes():
+        frappe.db.add_index(doctype, columns)
+
+
+def check_sync_indexes() -> None:
+    """Report the sync indexes missing after a migration, e.g. after a custom field was added."""
+    missing_indexes = get_missing_sync_indexes()
+
+    if len(missing_indexes) == 0:
+        return
+
+    message = 'Missing PythaCore sync indexes, run `pythacore.indexes.add_sync_indexes` to add them:\n'
+    message += '\n'.join(f"- {doctype} ({', '.join(columns)})" for doctype, columns in missing_indexes)
+
+    print(message)
+    frappe.log_error(message, 'Missing PythaCore sync indexes')
+
+
+def get_missing_sync_indexes() -> list:
+    return [(doctype, columns) for doctype, columns in get_applicable_indexes()
+            if not frappe.db.has_index(f'tab{doctype}', frappe.db.get_index_name(columns))]
+
+
+def get_applicable_indexes() -> list:
+    return [(doctype, columns) for doctype, columns in SYNC_INDEXES
+            if all(frappe.db.has_column(doctype, column) for column in columns)]
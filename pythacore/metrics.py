@@ -0,0 +1,172 @@
+# System imports
+import json
+import time
+from contextlib import contextmanager
+
+# Frappe imports
+import frappe
+from frappe import _
+from frappe.utils import cint, flt, get_datetime, now_datetime
+
+SYNC_DOCTYPES = ['Winbooks Synchronisation', 'Farandsoft Synchronisation']
+
+# The phases ending a synchronisation. The totals of the synchronisation are written to
+# its `phase_metrics` once one of them is measured.
+FINAL_PHASES = ('set_success', 'abort', 'set_status')
+
+# Totals of a synchronisation whose results never come expire after a day.
+PHASE_METRICS_TTL = 24 * 60 * 60
+
+
+class QueryCounter:
+    """Count the queries run through `frappe.db.sql`, by wrapping it like `frappe.recorder` does."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        self.db = frappe.db
+        self.wrapped = 'sql' in vars(self.db)
+        self.sql = self.db.sql
+
+        def sql(*args, **kwargs):
+            self.count += 1
+            return self.sql(*args, **kwargs)
+
+        self.db.sql = sql
+
+        return self
+
+    def __exit__(self, *args):
+        if self.wrapped:
+            self.db.sql = self.sql
+        else:
+            del self.db.sql
+
+
+@contextmanager
+def measure_phase(sync_doctype, sync_doc_name, phase):
+    """Measure the wall time and the number of queries of the enclosed block.
+
+    The block receives a dict in which it sets the number of `documents` it handled. If
+    `sync_doc_name` is set, the measure is added to the totals of that synchronisation
+    in Redis. They are written to its `phase_metrics` by the last phase of the
+    synchronisation, see `FINAL_PHASES`.
+    """
+    metrics = frappe._dict({'documents': 0})
+    started = time.perf_counter()
+
+    with QueryCounter() as counter:
+        yield metrics
+
+    metrics.wall_time = time.perf_counter() - started
+    metrics.queries = counter.count
+
+    if sync_doc_name:
+        add_phase_metrics(sync_doctype, sync_doc_name, phase, metrics)
+
+        if phase in FINAL_PHASES:
+            flush_phase_metrics(sync_doctype, sync_doc_name)
+
+
+def add_phase_metrics(sync_doctype, sync_doc_name, phase, metrics) -> None:
+    """Add a measure to the totals of its phase, in one Redis round trip without locking the synchronisation."""
+    key = get_phase_metrics_key(sync_doctype, sync_doc_name)
+    pipeline = frappe.cache().pipeline()
+
+    if phase == 'start':
+        # Each run is timed on its own, so that a resumed synchronisation keeps the
+        # metrics of its previous runs.
+        pipeline.hset(key, 'run_started_at', str(now_datetime()))
+
+    pipeline.hincrby(key, f'{phase}|calls', 1)
+    pipeline.hincrbyfloat(key, f'{phase}|wall_time', metrics.wall_time)
+    pipeline.hincrby(key, f'{phase}|queries', metrics.queries)
+    pipeline.hincrby(key, f'{phase}|documents', metrics.documents)
+    pipeline.expire(key, PHASE_METRICS_TTL)
+    pipeline.execute()
+
+
+def flush_phase_metrics(sync_doctype, sync_doc_name) -> None:
+    """Add the totals accumulated in Redis to the `phase_metrics` of the synchronisation, and commit it."""
+    key = get_phase_metrics_key(sync_doctype, sync_doc_name)
+    pipeline = frappe.cache().pipeline()
+    pipeline.hgetall(key)
+    pipeline.delete(key)
+    totals = {frappe.safe_decode(field): frappe.safe_decode(value) for field, value in pipeline.execute()[0].items()}
+
+    if len(totals) == 0:
+        return
+
+    sync_metrics = get_sync_metrics_of(sync_doctype, sync_doc_name)
+    run_started_at = totals.pop('run_started_at', None)
+    now = now_datetime()
+
+    if run_started_at:
+        sync_metrics.setdefault('started_at', run_started_at)
+        sync_metrics['finished_at'] = str(now)
+        sync_metrics['total_time'] = flt(sync_metrics.get('total_time', 0)
+                                         + (now - get_datetime(run_started_at)).total_seconds(), 3)
+
+    for field, value in totals.items():
+        phase, counter = field.rsplit('|', 1)
+        phase_totals = sync_metrics['phases'].setdefault(
+            phase, {'calls': 0, 'wall_time': 0, 'queries': 0, 'documents': 0})
+
+        if counter == 'wall_time':
+            phase_totals[counter] = flt(phase_totals[counter] + flt(value), 3)
+        else:
+            phase_totals[counter] += cint(value)
+
+    frappe.db.set_value(sync_doctype, sync_doc_name, 'phase_metrics',
+                        json.dumps(sync_metrics), update_modified=False)
+    frappe.db.commit()
+
+
+def get_sync_metrics_of(sync_doctype, sync_doc_name) -> dict:
+    phase_metrics = frappe.db.get_value(sync_doctype, sync_doc_name, 'phase_metrics')
+    sync_metrics = json.loads(phase_metrics) if phase_metrics else {}
+    sync_metrics.setdefault('phases', {})
+
+    return sync_metrics
+
+
+def get_phase_metrics_key(sync_doctype, sync_doc_name) -> str:
+    return frappe.cache().make_key(f'pythacore_phase_metrics|{sync_doctype}|{sync_doc_name}')
+
+
+@frappe.whitelist()
+def get_sync_metrics(sync_doctype, limit=50) -> list:
+    """Return the phase metrics of the last synchronisations, oldest first, to graph trends.
+
+    Each phase also gets its throughput in documents per second. The time of the
+    synchronisation spent outside of the measured phases, i.e. on PythaCore's side, is
+    returned as `external_time`.
+    """
+    if sync_doctype not in SYNC_DOCTYPES:
+        frappe.throw(_('{0} is not a synchronisation.').format(sync_doctype))
+
+    frappe.has_permission(sync_doctype, 'read', throw=True)
+
+    syncs = frappe.db.get_all(
+        sync_doctype,
+        filters={'phase_metrics': ['is', 'set']},
+        fields=['name', 'status', 'creation', 'phase_metrics'],
+        order_by='creation desc',
+        page_length=cint(limit)
+    )
+
+    for sync in syncs:
+        sync_metrics = json.loads(sync.pop('phase_metrics'))
+        phases = sync_metrics['phases']
+
+        for totals in phases.values():
+            totals['throughput'] = flt(totals['documents'] / totals['wall_time'], 2) if totals['wall_time'] else 0
+
+        sync.update(sync_metrics)
+
+        if 'total_time' in sync_metrics:
+            erp_time = sum(totals['wall_time'] for totals in phases.values())
+            sync['external_time'] = flt(sync_metrics['total_time'] - erp_time, 3)
+
+    return list(reversed(syncs))
@@ -0,0 +1,133 @@
+# System imports
+import threading
+from contextlib import contextmanager
+
+# Frappe imports
+import frappe
+from frappe import _
+from frappe.database import get_db
+from frappe.model.naming import parse_naming_series
+from frappe.utils import cint
+
+# How many codes of a naming series a process reserves at once, unless
+# `pythacore_fs_code_block_size` is set in the site config.
+DEFAULT_FS_CODE_BLOCK_SIZE = 20
+
+# Blocks of codes reserved by this process, by site and series: [next value, last value].
+# They only live as long as the process: the values left in a block when a worker exits,
+# e.g. at the end of every forked RQ job, are never handed out.
+_fs_code_blocks = {}
+_fs_code_blocks_lock = threading.Lock()
+
+# Request-local transaction state that `Database.connect` and `Database.commit` reset.
+REQUEST_STATE = ['rollback_observers', 'before_commit', 'realtime_log', 'link_count']
+_missing = object()
+
+
+def make_fs_code(naming_series, doctype, doc) -> str:
+    """Return the next `fs_code` of `naming_series`, like `make_autoname` would.
+
+    `make_autoname` locks the row of the series in `tabSeries` until the transaction of
+    the document is committed, so concurrent imports wait on each other. Here, each
+    process reserves a block of values in its own short transaction, then hands them out
+    from memory. Codes stay unique, and increase within a block, but the blocks of
+    several processes interleave and the unused values of a block are skipped for good
+    when the process exits. Gaps in the numbering are expected.
+    """
+    # Same defaults and checks as `make_autoname`.
+    if '#' not in naming_series:
+        naming_series += '.#####'
+    elif '.' not in naming_series:
+        frappe.throw(_('Invalid naming series (. missing)'))
+
+    parts = naming_series.split('.')
+    digits_idx = next((idx for idx, part in enumerate(parts) if part.startswith('#')), None)
+
+    if digits_idx is None:
+        frappe.throw(_('Naming series {0} has no digits.').format(naming_series))
+
+    prefix = parse_naming_series(parts[:digits_idx], doctype=doctype, doc=doc)
+    suffix = parse_naming_series(parts[digits_idx + 1:], doctype=doctype, doc=doc)
+    digits = len(parts[digits_idx])
+
+    return prefix + str(get_next_value(prefix)).zfill(digits) + suffix
+
+
+def get_next_value(series) -> int:
+    key = (frappe.local.site, series)
+
+    with _fs_code_blocks_lock:
+        block = _fs_code_blocks.get(key)
+
+        if block is None or block[0] > block[1]:
+            block = _fs_code_blocks[key] = list(reserve_block(series, get_block_size()))
+
+        value = block[0]
+        block[0] += 1
+
+    return value
+
+
+def reserve_block(series, size) -> tuple:
+    """Reserve `size` values of `series` in `tabSeries`, and return the first and last ones.
+
+    The reservation is committed on a separate, short-lived connection, so that the row of
+    the series is only locked for the time of this update and not until the caller commits.
+    """
+    with own_request_state():
+        db = get_db()
+
+        try:
+            db.connect()
+
+            return reserve_block_on(db, series, size)
+        finally:
+            db.close()
+
+
+def reserve_block_on(db, series, size) -> tuple:
+    current = db.sql('select `current` from `tabSeries` where `name` = %s for update', (series,))
+
+    if current and current[0][0] is not None:
+        first = cint(current[0][0]) + 1
+        db.sql('update `tabSeries` set `current` = `current` + %s where `name` = %s', (size, series))
+    else:
+        first = 1
+        db.sql('insert into `tabSeries` (`name`, `current`) values (%s, %s)', (series, size))
+
+    db.commit()
+
+    return first, first + size - 1
+
+
+@contextmanager
+def own_request_state():
+    """Run the enclosed block with its own request-local transaction state, then restore the caller's.
+
+    `Database.connect` resets the rollback observers and `Database.commit` flushes the
+    realtime events and the jobs queued after commit. Those of the caller belong to its
+    own transaction, they are kept aside while the block runs.
+    """
+    saved = {}
+
+    for name in REQUEST_STATE:
+        saved[name] = getattr(frappe.local, name, _missing)
+        setattr(frappe.local, name, {} if name == 'link_count' else [])
+
+    saved_jobs = frappe.flags.enqueue_after_commit
+    frappe.flags.enqueue_after_commit = []
+
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is _missing:
+                delattr(frappe.local, name)
+            else:
+                setattr(frappe.local, name, value)
+
+        frappe.flags.enqueue_after_commit = saved_jobs
+
+
+def get_block_size() -> int:
+    return cint(frappe.conf.get('pythacore_fs_code_block_size')) or DEFAULT_FS_CODE_BLOCK_SIZE
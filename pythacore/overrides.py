@@ -1,5 +1,9 @@
 import frappe
-from frappe.model.naming import make_autoname, set_name_from_naming_options
+from frappe.model.naming import set_name_from_naming_options
+
+# Local imports
+from pythacore.farandsoft.codes import clear_code_maps
+from pythacore.naming import make_fs_code
 
 # Doctypes
 from erpnext.setup.doctype.item_group.item_group import ItemGroup
@@ -31,11 +35,25 @@ class CustomAddress(Address):
             self.name = new_address
             self.address_title = new_address
 
-        self.fs_code = make_autoname(self.naming_series, 'Address', self)
+        self.fs_code = make_fs_code(self.naming_series, 'Address', self)
 
 
 class CustomTerritory(Territory):
     def autoname(self):
         super().autoname()
 
-        self.fs_code = make_autoname(self.naming_series, 'Territory', self)
+        self.fs_code = make_fs_code(self.naming_series, 'Territory', self)
+
+    def on_update(self):
+        super().on_update()
+        clear_code_maps(self.doctype)
+
+    def on_trash(self):
+        super().on_trash()
+        clear_code_maps(self.doctype)
+
+    def after_rename(self, old, new, merge=False):
+        if hasattr(super(), 'after_rename'):
+            super().after_rename(old, new, merge)
+
+        clear_code_maps(self.doctype)
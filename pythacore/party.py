@@ -0,0 +1,195 @@
+import frappe
+from frappe.desk.reportview import get_filters_cond
+from frappe.utils import cint
+
+# Local imports
+from pythacore.utils import (chunk, decode_cursor, encode_cursor, get_page_length, get_sync_filters,
+                             normalize_filters, remove_fields, with_extra_fields)
+
+ADDRESS_FIELDS = ['name', 'address_line1', 'address_line2',
+                  'city', 'pincode', 'country', 'address_type', 'fs_code']
+CONTACT_FIELDS = ['first_name', 'last_name',
+                  'email_id', 'phone', 'is_primary_contact']
+
+
+def set_addresses_and_contacts(parties, party_doctype, with_contacts=True, blank_addresses=False) -> None:
+    """Set the `addresses` (and `contacts`) lists of the given Customers/Suppliers.
+
+    Instead of querying the links, addresses and contacts party by party, we fetch every
+    `Dynamic Link` of the page in one query, then the linked Address and Contact records
+    with one `name in (...)` query each, and assemble the nested lists in memory.
+    """
+    party_field = party_doctype.lower()
+    parenttypes = ['Address', 'Contact'] if with_contacts else ['Address']
+    links = get_links(party_doctype, [party['name']
+                      for party in parties], parenttypes)
+    addresses = get_records('Address', ADDRESS_FIELDS, [
+                            link['parent'] for link in links if link['parenttype'] == 'Address'])
+    contacts = get_records('Contact', ['name'] + CONTACT_FIELDS, [
+                           link['parent'] for link in links if link['parenttype'] == 'Contact'])
+
+    party_links = {}
+
+    for link in links:
+        party_links.setdefault(link['link_name'], []).append(link)
+
+    for party in parties:
+        party.addresses = []
+
+        if with_contacts:
+            party.contacts = []
+
+        for link in party_links.get(party['name'], []):
+            if link['parenttype'] == 'Address' and link['parent'] in addresses:
+                address = frappe._dict(addresses[link['parent']])
+                address[party_field] = party['name']
+
+                if blank_addresses:
+                    blank_empty_values(address)
+
+                party.addresses.append(address)
+            elif link['parenttype'] == 'Contact' and link['parent'] in contacts:
+                contact = frappe._dict({field: contacts[link['parent']][field]
+                                        for field in CONTACT_FIELDS})
+                contact[party_field] = party['name']
+                blank_empty_values(contact)
+                party.contacts.append(contact)
+
+
+def get_links(party_doctype, names, parenttypes) -> list:
+    links = []
+
+    for names_chunk in chunk(names):
+        links += frappe.db.get_all('Dynamic Link', filters={
+            'link_doctype': party_doctype,
+            'link_name': ['in', names_chunk],
+            'parenttype': ['in', parenttypes]
+        }, fields=['parent', 'parenttype', 'link_name'], order_by='modified desc')
+
+    return links
+
+
+def get_records(doctype, fields, names) -> dict:
+    records = {}
+
+    for names_chunk in chunk(set(names)):
+        for record in frappe.db.get_all(doctype, filters={'name': ['in', names_chunk]}, fields=fields):
+            records[record['name']] = record
+
+    return records
+
+
+def blank_empty_values(record) -> None:
+    for part in record:
+        if record[part] is None:
+            record[part] = ''
+
+
+def get_changed_parties(party_doctype, fields, filters, limit=None) -> list:
+    """Return the Customers/Suppliers matching `filters` that changed since their last synchronisation.
+
+    Like `frappe.db.get_all`, parties are ordered by `modified` descending.
+    """
+    fields, added_fields = with_extra_fields(fields, ['name'])
+    names = get_changed_party_names(party_doctype, filters, limit=limit)
+    parties = get_parties(party_doctype, fields, names)
+
+    remove_fields(parties, added_fields)
+
+    return parties
+
+
+def get_changed_parties_page(party_doctype, fields, filters, cursor=None, page_length=None):
+    """Paginated variant of `get_changed_parties`, see `pythacore.utils.get_page`."""
+    fields, added_fields = with_extra_fields(fields, ['modified', 'name'])
+    page_length = get_page_length(page_length)
+    after = decode_cursor(cursor) if cursor else None
+    names = get_changed_party_names(party_doctype, filters, after, page_length)
+    parties = get_parties(party_doctype, fields, names)
+
+    next_cursor = None
+
+    if len(parties) == page_length:
+        next_cursor = encode_cursor(parties[-1]['modified'], parties[-1]['name'])
+
+    remove_fields(parties, added_fields)
+
+    return parties, next_cursor
+
+
+def get_parties(party_doctype, fields, names) -> list:
+    """Return the `fields` of the given parties, in the order of `names`."""
+    parties = {}
+
+    for names_chunk in chunk(names):
+        for party in frappe.db.get_all(party_doctype, fields=fields, filters={'name': ['in', names_chunk]}):
+            parties[party['name']] = party
+
+    return [parties[name] for name in names if name in parties]
+
+
+def get_changed_party_names(party_doctype, filters=None, after=None, limit=None) -> list:
+    """Return the Customers/Suppliers matching `filters` that changed since their last Winbooks synchronisation.
+
+    `winbooks_sync_date` is the watermark: a party changed if it was never synchronised,
+    or if the party itself, one of its addresses or one of its contacts was modified
+    after that date. The watermark is checked in the query, row by row, so its cost is
+    the one of the page and not of the whole table. Without `after`, parties are ordered
+    by `modified` descending. With `after`, a (`modified`, `name`) pair, they are the
+    parties after it in ascending order, as in `pythacore.utils.get_page`.
+    """
+    if party_doctype not in ('Customer', 'Supplier'):
+        frappe.throw(frappe._('{0} is not a party.').format(party_doctype))
+
+    table = f'`tab{party_doctype}`'
+    # Conditions on `winbooks_sync_date` are replaced by the watermark.
+    filters = [condition for condition in normalize_filters(filters)
+               if isinstance(condition, str) or condition[-3] != 'winbooks_sync_date']
+    conditions = get_filters_cond(party_doctype, get_sync_filters(party_doctype, filters), [],
+                                  ignore_permissions=True)
+    values = {'party_doctype': party_doctype}
+    order_by = f'{table}.modified desc'
+
+    if after is not None:
+        # (modified, name) > (after modified, after name)
+        conditions += f"""
+            and {table}.modified >= %(after_modified)s
+            and ({table}.modified > %(after_modified)s or {table}.name > %(after_name)s)
+        """
+        values['after_modified'], values['after_name'] = after
+        order_by = f'{table}.modified asc, {table}.name asc'
+
+    limit_clause = ''
+
+    if limit:
+        limit_clause = 'limit %(limit)s'
+        values['limit'] = cint(limit)
+
+    return frappe.db.sql_list(f"""
+        select {table}.name
+        from {table}
+        where (
+            {table}.winbooks_sync_date is null
+            or {table}.modified > {table}.winbooks_sync_date
+            or exists (
+                select 1
+                from `tabDynamic Link` link
+                inner join `tabAddress` address on address.name = link.parent
+                where link.link_doctype = %(party_doctype)s
+                    and link.link_name = {table}.name
+                    and link.parenttype = 'Address'
+                    and address.modified > {table}.winbooks_sync_date
+            )
+            or exists (
+                select 1
+                from `tabDynamic Link` link
+                inner join `tabContact` contact on contact.name = link.parent
+                where link.link_doctype = %(party_doctype)s
+                    and link.link_name = {table}.name
+                    and link.parenttype = 'Contact'
+                    and contact.modified > {table}.winbooks_sync_date
+            )
+        ) {conditions}
+        order by {order_by}
+        {limit_clause}
+    """, values)
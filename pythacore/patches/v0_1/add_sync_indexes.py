@@ -0,0 +1,6 @@
+# Local imports
+from pythacore.indexes import add_sync_indexes
+
+
+def execute():
+    add_sync_indexes()
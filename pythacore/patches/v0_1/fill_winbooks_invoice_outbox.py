@@ -0,0 +1,9 @@
+import frappe
+
+# Local imports
+from pythacore.winbooks.doctype.winbooks_invoice_outbox.winbooks_invoice_outbox import fill_outbox
+
+
+def execute():
+    frappe.reload_doc('winbooks', 'doctype', 'winbooks_invoice_outbox')
+    fill_outbox()
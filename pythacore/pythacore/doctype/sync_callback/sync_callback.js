@@ -0,0 +1,7 @@
+// Copyright (c) 2026, Kano Solutions SRL
+
+frappe.ui.form.on('Sync Callback', {
+	refresh(frm) {
+		frm.disable_save();
+	}
+});
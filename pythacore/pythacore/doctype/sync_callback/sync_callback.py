@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Kano Solutions and contributors
+# For license information, please see license.txt
+
+# System imports
+import hashlib
+
+# Frappe imports
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import cint, now_datetime
+from frappe.utils.background_jobs import enqueue
+
+# Local imports
+from pythacore.utils import SYNC_JOB_TIMEOUT, get_sync_queue, get_sync_slot_holder, release_sync_slot
+from pythacore.wire import parse_payload
+
+
+class SyncCallback(Document):
+    pass
+
+
+def on_doctype_update():
+    # Serves `get_next_sync_callback`.
+    frappe.db.add_index('Sync Callback', ['sync_name', 'status'])
+
+
+def should_defer(defer=None) -> bool:
+    """Whether a result callback should be processed in the background.
+
+    PythaCore can ask for it with the `defer` argument of the callback, otherwise it is
+    set for the whole site with `pythacore_defer_sync_callbacks` in the site config.
+    """
+    if defer is not None:
+        return bool(cint(defer))
+
+    return bool(cint(frappe.conf.get('pythacore_defer_sync_callbacks')))
+
+
+def queue_sync_callback(sync_doctype, sync_name, method, payload) -> str:
+    """Store the raw payload of a result callback, and enqueue its processing.
+
+    `method` is the path of the function processing the payload, called with the name of
+    the synchronisation and the parsed payload. There is one Sync Callback per
+    synchronisation and method: a callback PythaCore sends again replaces the stored
+    payload and is processed again, so the processing must be idempotent. The callbacks of
+    a synchronisation are processed one at a time, see `process_sync_callbacks`.
+    """
+    name = get_sync_callback_name(sync_doctype, sync_name, method)
+    values = {
+        'payload': frappe.safe_decode(payload),
+        'status': 'Queued',
+        'processed_at': None,
+        'error': None
+    }
+
+    if frappe.db.exists('Sync Callback', name):
+        frappe.db.set_value('Sync Callback', name, values)
+    else:
+        callback = frappe.new_doc('Sync Callback')
+        callback.update(values)
+        callback.update({
+            'name': name,
+            'sync_doctype': sync_doctype,
+            'sync_name': sync_name,
+            'method': method
+        })
+        callback.db_insert()
+
+    enqueue(
+        process_sync_callback,
+        queue=get_sync_queue(),
+        timeout=SYNC_JOB_TIMEOUT,
+        event='sync_callback',
+        job_name=name,
+        callback_name=name,
+        enqueue_after_commit=True,
+        now=frappe.flags.in_test
+    )
+
+    return name
+
+
+def process_sync_callback(callback_name) -> None:
+    """This method runs in background job"""
+    callback = frappe.db.get_value('Sync Callback', callback_name, ['sync_doctype', 'sync_name'], as_dict=True)
+
+    if callback:
+        process_sync_callbacks(callback.sync_doctype, callback.sync_name)
+
+
+def process_sync_callbacks(sync_doctype, sync_name) -> None:
+    """Process the queued callbacks of a synchronisation, one at a time, in the order they were received.
+
+    A Redis lock per synchronisation makes sure that only one job processes its callbacks.
+    A job which cannot take the lock leaves its callback to the job holding it, which
+    processes the queued callbacks until there is none left.
+    """
+    cache = frappe.cache()
+    lock_key = cache.make_key(f'pythacore_sync_callback_lock|{sync_doctype}|{sync_name}')
+
+    while cache.set(lock_key, 1, nx=True, ex=SYNC_JOB_TIMEOUT):
+        try:
+            callback_name = get_next_sync_callback(sync_doctype, sync_name)
+
+            while callback_name is not None:
+                run_sync_callback(callback_name)
+                callback_name = get_next_sync_callback(sync_doctype, sync_name)
+        finally:
+            cache.delete(lock_key)
+
+        # A callback queued while the lock was released was left to this job.
+        if get_next_sync_callback(sync_doctype, sync_name) is None:
+            break
+
+
+def run_sync_callback(callback_name) -> None:
+    callback = frappe.db.get_value('Sync Callback', callback_name,
+                                   ['sync_doctype', 'sync_name', 'method', 'payload'], as_dict=True)
+    # Results are never held back by the limit of concurrent synchronisations: the data is
+    # already in Winbooks, it must be stamped. The callback ends the synchronisation, so it
+    # releases its slot in any case.
+    slot_holder = get_sync_slot_holder(callback.sync_doctype, callback.sync_name)
+
+    frappe.db.set_value('Sync Callback', callback_name, 'status', 'Processing')
+    frappe.db.commit()
+
+    # The result is only recorded if the callback was not sent again in the meantime,
+    # otherwise it stays queued and is processed again with its new payload.
+    processing = {'name': callback_name, 'status': 'Processing'}
+
+    try:
+        frappe.get_attr(callback.method)(callback.sync_name, parse_payload(callback.payload))
+    except Exception:
+        frappe.db.rollback()
+        error = frappe.get_traceback()
+        frappe.db.set_value('Sync Callback', processing, {
+            'status': 'Error',
+            'error': error
+        })
+        frappe.db.set_value(callback.sync_doctype, callback.sync_name, {
+            'status': 'Error',
+            'error_message': _('The results sent by PythaCore could not be processed.')
+        })
+        frappe.log_error(error)
+    else:
+        frappe.db.set_value('Sync Callback', processing, {
+            'status': 'Done',
+            'processed_at': now_datetime()
+        })
+    finally:
+        release_sync_slot(slot_holder)
+
+    frappe.db.commit()
+
+
+def get_next_sync_callback(sync_doctype, sync_name):
+    return frappe.db.get_value('Sync Callback', {
+        'sync_doctype': sync_doctype,
+        'sync_name': sync_name,
+        'status': 'Queued'
+    }, 'name', order_by='modified asc')
+
+
+def delete_sync_callbacks(sync_doctype, sync_name) -> None:
+    frappe.db.delete('Sync Callback', {
+        'sync_doctype': sync_doctype,
+        'sync_name': sync_name
+    })
+
+
+def get_sync_callback_name(sync_doctype, sync_name, method) -> str:
+    # Synchronisation names contain slashes and spaces, we use a hash of the key instead.
+    key = '\n'.join([sync_doctype, sync_name, method])
+
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Kano Solutions and contributors
+# For license information, please see license.txt
+
+# Frappe imports
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, now_datetime
+
+# Local imports
+from pythacore.utils import chunk
+
+LEDGER_FIELDS = ['status', 'reference_doctype',
+                 'reference_name', 'reference', 'message']
+
+# Default and maximum number of ledger entries returned by `get_sync_ledger`.
+DEFAULT_LEDGER_PAGE_LENGTH = 100
+MAX_LEDGER_PAGE_LENGTH = 1000
+
+
+class SyncLedger(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index('Sync Ledger', ['sync_name', 'status', 'reference_doctype'])
+
+
+def set_ledger_entries(sync_doctype, sync_name, entries, keep_checkpoints=False) -> None:
+    """Replace the ledger of a synchronisation with the given entries.
+
+    Each entry is a dict with the keys of `LEDGER_FIELDS`, and `checkpoint` for the
+    documents acknowledged by a checkpoint. Entries are inserted in bulk, in the given
+    order, without loading a document per entry. With `keep_checkpoints`, the checkpoint
+    entries of the documents which are not in `entries` are kept.
+    """
+    if not keep_checkpoints:
+        delete_ledger_entries(sync_doctype, sync_name)
+        add_ledger_entries(sync_doctype, sync_name, entries)
+        return
+
+    frappe.db.delete('Sync Ledger', {
+        'sync_doctype': sync_doctype,
+        'sync_name': sync_name,
+        'checkpoint': 0
+    })
+
+    references = {}
+
+    for entry in entries:
+        references.setdefault(entry.get('reference_doctype'), []).append(entry.get('reference_name'))
+
+    for reference_doctype, reference_names in references.items():
+        for names_chunk in chunk(reference_names):
+            frappe.db.delete('Sync Ledger', {
+                'sync_doctype': sync_doctype,
+                'sync_name': sync_name,
+                'reference_doctype': reference_doctype,
+                'reference_name': ['in', names_chunk]
+            })
+
+    start_idx = frappe.db.count('Sync Ledger', {'sync_doctype': sync_doctype, 'sync_name': sync_name})
+    add_ledger_entries(sync_doctype, sync_name, entries, start_idx)
+
+
+def add_ledger_entries(sync_doctype, sync_name, entries, start_idx=0) -> None:
+    now = now_datetime()
+    user = frappe.session.user
+    fields = ['name', 'creation', 'modified', 'owner', 'modified_by', 'docstatus', 'idx',
+              'sync_doctype', 'sync_name', 'checkpoint'] + LEDGER_FIELDS
+    values = []
+
+    for idx, entry in enumerate(entries, start=start_idx + 1):
+        values.append([frappe.generate_hash(length=10), now, now, user, user, 0, idx, sync_doctype, sync_name,
+                       cint(entry.get('checkpoint'))] + [entry.get(field) for field in LEDGER_FIELDS])
+
+    frappe.db.bulk_insert('Sync Ledger', fields, values)
+
+
+def delete_ledger_entries(sync_doctype, sync_name) -> None:
+    frappe.db.delete('Sync Ledger', {
+        'sync_doctype': sync_doctype,
+        'sync_name': sync_name
+    })
+
+
+@frappe.whitelist()
+def get_sync_ledger(sync_doctype, sync_name, status=None, reference_doctype=None, start=0, page_length=None) -> dict:
+    """Return a page of the ledger of a synchronisation, and the number of matching entries."""
+    frappe.has_permission(sync_doctype, 'read', sync_name, throw=True)
+
+    filters = {'sync_doctype': sync_doctype, 'sync_name': sync_name}
+
+    if status:
+        filters['status'] = status
+
+    if reference_doctype:
+        filters['reference_doctype'] = reference_doctype
+
+    page_length = min(cint(page_length) or DEFAULT_LEDGER_PAGE_LENGTH, MAX_LEDGER_PAGE_LENGTH)
+
+    entries = frappe.db.get_all(
+        'Sync Ledger',
+        filters=filters,
+        fields=LEDGER_FIELDS,
+        order_by='idx asc',
+        start=cint(start),
+        page_length=page_length
+    )
+
+    return {
+        'entries': entries,
+        'total': frappe.db.count('Sync Ledger', filters)
+    }
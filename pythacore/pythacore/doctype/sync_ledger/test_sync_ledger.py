@@ -0,0 +1,8 @@
+# Copyright (c) 2026, Kano Solutions and Contributors
+# See license.txt
+
+# import frappe
+import unittest
+
+class TestSyncLedger(unittest.TestCase):
+	pass
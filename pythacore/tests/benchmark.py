@@ -0,0 +1,190 @@
+# System imports
+import json
+import time
+import tracemalloc
+
+# Frappe imports
+import frappe
+from frappe import _
+from frappe.utils import add_days, flt, getdate, now_datetime, set_request
+
+# Local imports
+from pythacore.farandsoft.doctype.farandsoft_synchronisation import farandsoft_synchronisation
+from pythacore.metrics import QueryCounter
+from pythacore.tests.synthetic_data import (DEFAULT_PREFIX, create_sync_doc, create_synthetic_data,
+                                            delete_synthetic_data)
+from pythacore.tests.utils import get_filters
+from pythacore.winbooks.doctype.winbooks_synchronisation import winbooks_synchronisation
+
+DEFAULT_SCALES = [100, 1000, 10000]
+
+# How many Sales Orders are created at each scale. They are fully validated, so they
+# are much slower than the exports and are not created at the full scale.
+SALES_ORDER_SAMPLE = 20
+
+
+def run(scales=None, prefix=DEFAULT_PREFIX, output=None, baseline=None) -> list:
+    """Benchmark the synchronisation endpoints against synthetic data, at several scales.
+
+    Run it on a test site with:
+
+        bench --site test_site execute pythacore.tests.benchmark.run --kwargs "{'scales': [100, 1000]}"
+
+    For each scale, the synthetic data is created, every endpoint is called once to
+    measure its peak memory with `tracemalloc`, then once more to measure its latency and
+    query count, and the data is deleted. The results are printed, written as JSON to
+    `output` if set, and compared with the results of a previous run read from `baseline`.
+    """
+    results = []
+    baseline_results = read_baseline(baseline) if baseline else {}
+
+    for scale in scales or DEFAULT_SCALES:
+        # Leftovers of an interrupted run would skew the measures.
+        delete_synthetic_data(prefix)
+        started_at = now_datetime()
+
+        try:
+            data = create_synthetic_data(scale, prefix)
+            sync_doc_name = create_sync_doc(prefix)
+
+            for endpoint, call in get_endpoints(data, sync_doc_name, started_at):
+                try:
+                    result = measure(call)
+                except Exception as e:
+                    # A failing endpoint should not prevent measuring the others.
+                    frappe.db.rollback()
+                    frappe.clear_messages()
+                    result = {'error': str(e)}
+
+                result.update({'scale': scale, 'endpoint': endpoint})
+                results.append(result)
+                print_result(result, baseline_results.get((scale, endpoint)))
+        finally:
+            frappe.db.rollback()
+            delete_synthetic_data(prefix)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    return results
+
+
+def get_endpoints(data, sync_doc_name, started_at) -> list:
+    invoice_fields = ['name', 'posting_date', 'due_date', 'net_total', 'grand_total']
+    customer_fields = ['name', 'customer_name', 'customer_type', 'disabled']
+    supplier_fields = ['name', 'supplier_name', 'supplier_type', 'disabled']
+
+    return [
+        ('get_invoices (Sales Invoice)', lambda: winbooks_synchronisation.get_invoices(
+            'Sales Invoice', invoice_fields + ['customer'], get_filters(data.sales_invoices), 0, 'name asc')),
+        ('get_invoices (Purchase Invoice)', lambda: winbooks_synchronisation.get_invoices(
+            'Purchase Invoice', invoice_fields + ['supplier'], get_filters(data.purchase_invoices), 0, 'name asc')),
+        ('get_all_customers', lambda: winbooks_synchronisation.get_all_customers(
+            customer_fields, get_filters(data.customers), 0)),
+        ('get_all_suppliers', lambda: winbooks_synchronisation.get_all_suppliers(
+            supplier_fields, get_filters(data.suppliers), 0)),
+        ('get_all_customer_addresses', lambda: farandsoft_synchronisation.get_all_customer_addresses(
+            modified_since=started_at)),
+        ('set_success', lambda: set_success(data, sync_doc_name)),
+        ('create_sales_order', lambda: create_sales_orders(data.customers))
+    ]
+
+
+def measure(call) -> dict:
+    """Return the documents, latency, query count and peak memory of `call`."""
+    tracemalloc.start()
+
+    try:
+        call()
+        _current, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    started = time.perf_counter()
+
+    with QueryCounter() as counter:
+        documents = call()
+
+    return {
+        'documents': documents if isinstance(documents, int) else len(documents or []),
+        'latency': flt(time.perf_counter() - started, 4),
+        'queries': counter.count,
+        'peak_memory': flt(peak_memory / 1024, 1)
+    }
+
+
+def set_success(data, sync_doc_name) -> int:
+    payload = get_success_payload(data)
+    call_with_request(winbooks_synchronisation.set_success, payload, sync_doc_name=sync_doc_name, defer=0)
+
+    return len(payload['docs'])
+
+
+def create_sales_orders(customers) -> int:
+    """Create `SALES_ORDER_SAMPLE` Sales Orders one by one, then roll them back."""
+    item_codes = frappe.db.get_all('Item', filters={
+        'is_sales_item': 1,
+        'disabled': 0,
+        'has_variants': 0
+    }, order_by='name asc', page_length=3, pluck='name')
+
+    if len(item_codes) == 0:
+        frappe.throw(_('The benchmark needs at least one sales item to create Sales Orders.'))
+
+    delivery_date = add_days(getdate(), 7)
+    frappe.db.savepoint('benchmark')
+
+    try:
+        for idx in range(SALES_ORDER_SAMPLE):
+            call_with_request(farandsoft_synchronisation.create_sales_order, {
+                'customer': customers[idx % len(customers)],
+                'order_type': 'Sales',
+                'transaction_date': getdate(),
+                'delivery_date': delivery_date,
+                'fs_reference': f'BENCH-{idx}',
+                'items': [{'item_code': item_code, 'qty': 2, 'rate': 10, 'delivery_date': delivery_date}
+                          for item_code in item_codes],
+                'taxes': []
+            })
+    finally:
+        frappe.db.rollback(save_point='benchmark')
+
+    return SALES_ORDER_SAMPLE
+
+
+def call_with_request(method, payload, **kwargs):
+    """Call an endpoint reading its payload from the body of the request, as PythaCore does."""
+    set_request(method='POST', data=json.dumps(payload, default=str), content_type='application/json')
+
+    try:
+        return method(**kwargs)
+    finally:
+        frappe.local.request = None
+
+
+def get_success_payload(data) -> dict:
+    return {'docs': [{'doctype': 'Sales Invoice', 'name': name} for name in data.sales_invoices]
+            + [{'doctype': 'Purchase Invoice', 'name': name} for name in data.purchase_invoices]
+            + [{'doctype': 'Customer', 'name': name} for name in data.customers]
+            + [{'doctype': 'Supplier', 'name': name} for name in data.suppliers]}
+
+
+def read_baseline(path) -> dict:
+    with open(path) as f:
+        return {(result['scale'], result['endpoint']): result for result in json.load(f)}
+
+
+def print_result(result, baseline_result=None) -> None:
+    if 'error' in result:
+        print('{scale:>7} {endpoint:<34} failed: {error}'.format(**result))
+        return
+
+    line = '{scale:>7} {endpoint:<34} {documents:>7} docs {latency:>9.4f} s {queries:>6} queries {peak_memory:>10.1f} KiB'.format(**result)
+
+    if baseline_result and 'error' not in baseline_result:
+        line += '  (latency x{0}, queries {1:+d})'.format(
+            flt(result['latency'] / baseline_result['latency'], 2) if baseline_result['latency'] else '-',
+            result['queries'] - baseline_result['queries'])
+
+    print(line)
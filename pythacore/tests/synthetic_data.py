@@ -0,0 +1,233 @@
+# System imports
+import json
+import random
+
+# Frappe imports
+import frappe
+from frappe.utils import add_days, flt, getdate, now_datetime
+
+# Local imports
+from pythacore.metrics import SYNC_DOCTYPES
+from pythacore.pythacore.doctype.sync_ledger.sync_ledger import delete_ledger_entries
+from pythacore.winbooks.doctype.winbooks_synchronisation.winbooks_synchronisation import (
+    TAXES_DOCTYPES, get_vat_from_taxes)
+
+# Every synthetic record is named after this prefix, so that it can be told apart from
+# the real data of the site and deleted afterwards.
+DEFAULT_PREFIX = 'PYTHABENCH'
+
+# Belgian VAT rates and the Winbooks VAT codes used in `item_wise_tax_detail`.
+VAT_RATES = [(21, '211400'), (12, '211200'), (6, '211100'), (0, '211000')]
+
+ADDRESSES_PER_PARTY = 2
+CONTACTS_PER_PARTY = 2
+ITEMS_PER_INVOICE = 5
+
+# Share of the invoices created without `vat_data`, like the invoices made before it existed.
+LEGACY_INVOICE_RATIO = 0.2
+
+
+def create_synthetic_data(scale, prefix=DEFAULT_PREFIX, seed=0) -> frappe._dict:
+    """Insert `scale` customers, suppliers, sales and purchase invoices, and commit them.
+
+    Customers and suppliers get `ADDRESSES_PER_PARTY` addresses and `CONTACTS_PER_PARTY`
+    contacts each. Invoices have items at several VAT rates, and a share of them has no
+    `vat_data`. Records are written with `frappe.db.bulk_insert`, without validation, so
+    that large volumes can be generated in a reasonable time. Return the names of the
+    created records by doctype.
+    """
+    rng = random.Random(seed)
+    data = frappe._dict({
+        'customers': [f'{prefix}-CUST-{idx:07d}' for idx in range(scale)],
+        'suppliers': [f'{prefix}-SUPP-{idx:07d}' for idx in range(scale)],
+        'sales_invoices': [f'{prefix}-SINV-{idx:07d}' for idx in range(scale)],
+        'purchase_invoices': [f'{prefix}-PINV-{idx:07d}' for idx in range(scale)]
+    })
+
+    insert_parties('Customer', data.customers, rng)
+    insert_parties('Supplier', data.suppliers, rng)
+    insert_invoices('Sales Invoice', data.sales_invoices, data.customers, rng)
+    insert_invoices('Purchase Invoice', data.purchase_invoices, data.suppliers, rng)
+
+    frappe.db.commit()
+
+    return data
+
+
+def delete_synthetic_data(prefix=DEFAULT_PREFIX) -> None:
+    """Delete every synthetic record created with `prefix`, and commit."""
+    like = f'{prefix}-%'
+
+    for sync_doctype in SYNC_DOCTYPES:
+        delete_ledger_entries(sync_doctype, f'{prefix}-SYNC')
+        frappe.db.delete(sync_doctype, {'name': f'{prefix}-SYNC'})
+
+    frappe.db.delete('Winbooks Invoice Outbox', {'reference_name': ['like', like]})
+
+    for doctype, taxes_doctype in TAXES_DOCTYPES.items():
+        frappe.db.delete(taxes_doctype, {'parent': ['like', like]})
+        frappe.db.delete(doctype, {'name': ['like', like]})
+
+    frappe.db.delete('Dynamic Link', {'parent': ['like', like]})
+
+    for doctype in ('Contact', 'Address', 'Customer', 'Supplier'):
+        frappe.db.delete(doctype, {'name': ['like', like]})
+
+    frappe.db.commit()
+
+
+def create_sync_doc(prefix=DEFAULT_PREFIX, sync_doctype='Winbooks Synchronisation') -> str:
+    """Insert a synchronisation to report synthetic results to, and commit it."""
+    sync_doc = frappe.new_doc(sync_doctype)
+    sync_doc.name = f'{prefix}-SYNC'
+    sync_doc.status = 'In Progress'
+
+    if sync_doctype == 'Winbooks Synchronisation':
+        sync_doc.sync_date = now_datetime()
+
+    # `before_save` would rename the synchronisation after the current time.
+    sync_doc.db_insert()
+    frappe.db.commit()
+
+    return sync_doc.name
+
+
+def insert_parties(party_doctype, names, rng) -> None:
+    party_field = 'customer' if party_doctype == 'Customer' else 'supplier'
+    group_field = f'{party_field}_group'
+    group = 'All Customer Groups' if party_doctype == 'Customer' else 'All Supplier Groups'
+
+    parties = []
+    addresses = []
+    contacts = []
+    links = []
+
+    for name in names:
+        parties.append(get_values(name, {
+            f'{party_field}_name': f'{name} SA',
+            f'{party_field}_type': 'Company',
+            group_field: group,
+            'disabled': 0
+        }))
+
+        if party_doctype == 'Customer':
+            parties[-1]['territory'] = 'All Territories'
+
+        for idx in range(ADDRESSES_PER_PARTY):
+            address_name = f'{name}-ADDR-{idx}'
+            addresses.append(get_values(address_name, {
+                'address_title': name,
+                'address_type': 'Billing' if idx == 0 else 'Shipping',
+                'address_line1': f'Rue de la Synchronisation {rng.randint(1, 300)}',
+                'city': rng.choice(['Bruxelles', 'Liège', 'Namur', 'Gent', 'Antwerpen']),
+                'pincode': str(rng.randint(1000, 9999)),
+                'country': 'Belgium'
+            }))
+            links.append(get_link(address_name, 'Address', party_doctype, name))
+
+        for idx in range(CONTACTS_PER_PARTY):
+            contact_name = f'{name}-CONT-{idx}'
+            contacts.append(get_values(contact_name, {
+                'first_name': f'Contact {idx}',
+                'last_name': name,
+                'email_id': f'contact{idx}@{name.lower()}.example.com',
+                'phone': f'+32 2 {rng.randint(100, 999)} {rng.randint(10, 99)} {rng.randint(10, 99)}',
+                'is_primary_contact': 1 if idx == 0 else 0
+            }))
+            links.append(get_link(contact_name, 'Contact', party_doctype, name))
+
+    bulk_insert(party_doctype, parties)
+    bulk_insert('Address', addresses)
+    bulk_insert('Contact', contacts)
+    bulk_insert('Dynamic Link', links)
+
+
+def insert_invoices(doctype, names, parties, rng) -> None:
+    party_field = 'customer' if doctype == 'Sales Invoice' else 'supplier'
+    today = getdate()
+
+    invoices = []
+    taxes = []
+
+    for idx, name in enumerate(names):
+        tax = get_vat_tax(name, doctype, rng)
+        net_total = sum(detail[2] for detail in json.loads(tax['item_wise_tax_detail']).values())
+        vat_data = None
+
+        if rng.random() >= LEGACY_INVOICE_RATIO:
+            total_vat, vat_breakup = get_vat_from_taxes([tax])
+            vat_data = json.dumps({
+                'total_vat_amount': total_vat,
+                'vat_code_breakup': vat_breakup
+            })
+
+        posting_date = add_days(today, -rng.randint(0, 365))
+        invoices.append(get_values(name, {
+            party_field: parties[idx % len(parties)],
+            'posting_date': posting_date,
+            'due_date': add_days(posting_date, 30),
+            'docstatus': 1,
+            'status': 'Unpaid',
+            'net_total': flt(net_total, 2),
+            'total_taxes_and_charges': tax['tax_amount'],
+            'grand_total': flt(net_total + tax['tax_amount'], 2),
+            'vat_data': vat_data
+        }))
+        taxes.append(tax)
+
+    bulk_insert(doctype, invoices)
+    bulk_insert(TAXES_DOCTYPES[doctype], taxes)
+
+
+def get_vat_tax(invoice_name, doctype, rng) -> frappe._dict:
+    """Return a VAT tax row whose items are taxed at random VAT rates."""
+    item_wise_tax_detail = {}
+
+    for idx in range(ITEMS_PER_INVOICE):
+        rate, vat_code = rng.choice(VAT_RATES)
+        base = flt(rng.uniform(5, 2000), 2)
+        item_wise_tax_detail[f'ITEM-{idx}'] = [rate, flt(base * rate / 100, 2), base, vat_code]
+
+    return frappe._dict(get_values(f'{invoice_name}-TAX', {
+        'parent': invoice_name,
+        'parenttype': doctype,
+        'parentfield': 'taxes',
+        'idx': 1,
+        'docstatus': 1,
+        'charge_type': 'On Net Total',
+        'description': 'VAT',
+        'tax_type': 'VAT',
+        'tax_amount': flt(sum(detail[1] for detail in item_wise_tax_detail.values()), 2),
+        'item_wise_tax_detail': json.dumps(item_wise_tax_detail)
+    }))
+
+
+def get_link(parent, parenttype, link_doctype, link_name) -> dict:
+    return get_values(f'{parent}-LINK', {
+        'parent': parent,
+        'parenttype': parenttype,
+        'parentfield': 'links',
+        'idx': 1,
+        'link_doctype': link_doctype,
+        'link_name': link_name
+    })
+
+
+def get_values(name, values) -> dict:
+    now = now_datetime()
+
+    return dict({
+        'name': name,
+        'creation': now,
+        'modified': now,
+        'owner': 'Administrator',
+        'modified_by': 'Administrator'
+    }, **values)
+
+
+def bulk_insert(doctype, records) -> None:
+    if len(records) == 0:
+        return
+
+    fields = list(records[0])
+    frappe.db.bulk_insert(doctype, fields, [[record[field] for field in fields] for record in records])
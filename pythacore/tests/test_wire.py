@@ -0,0 +1,40 @@
+# Copyright (c) 2026, Kano Solutions and Contributors
+# See license.txt
+
+import gzip
+import unittest
+
+import frappe
+
+from pythacore.wire import COLUMNS_KEY, decode_columns, decompress, encode_columns
+
+class TestWire(unittest.TestCase):
+	def assertRoundTrip(self, value):
+		self.assertEqual(decode_columns(encode_columns(value)), value)
+
+	def test_columns_round_trip(self):
+		self.assertRoundTrip([{'a': 1, 'b': None}, {'a': 2, 'b': 'x'}])
+		self.assertRoundTrip({'data': [{'name': 'A', 'addresses': [{'city': 'Liège'}]}], 'cursor': None})
+		self.assertRoundTrip([[{'a': 1}], 1, 'a', None])
+		self.assertRoundTrip([])
+
+	def test_columns_keep_missing_keys_missing(self):
+		value = [{'a': 1}, {'b': 2}]
+
+		self.assertNotIn(COLUMNS_KEY, encode_columns(value))
+		self.assertRoundTrip(value)
+
+	def test_columns_are_encoded(self):
+		encoded = encode_columns([{'a': 1, 'b': 2}, {'a': 3, 'b': 4}])
+
+		self.assertEqual(encoded, {COLUMNS_KEY: ['a', 'b'], 'rows': [[1, 2], [3, 4]]})
+
+	def test_decompress(self):
+		body = b'{"docs": []}'
+
+		self.assertEqual(decompress(gzip.compress(body), 'gzip', len(body)), body)
+
+	def test_decompress_limit(self):
+		body = gzip.compress(b'0' * 1024 * 1024)
+
+		self.assertRaises(frappe.ValidationError, decompress, body, 'gzip', 1024)
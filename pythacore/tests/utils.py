@@ -0,0 +1,43 @@
+# Local imports
+from pythacore.metrics import QueryCounter
+
+# Number of records the query budgets are measured with, see `QueryBudgetMixin`.
+SMALL_SCALE = 5
+LARGE_SCALE = 25
+
+
+def count_queries(call, *args, **kwargs) -> int:
+    """Return how many queries `call` runs once the caches it relies on are warm.
+
+    The first call fills the caches (metadata, Redis...), only the second one is counted,
+    so that the count only depends on the data `call` works on.
+    """
+    call(*args, **kwargs)
+
+    with QueryCounter() as counter:
+        call(*args, **kwargs)
+
+    return counter.count
+
+
+def get_filters(names) -> list:
+    """Return the filters selecting the synthetic records from the first to the last of `names`."""
+    return [['name', '>=', names[0]], ['name', '<=', names[-1]]]
+
+
+class QueryBudgetMixin:
+    """Assertions on the number of queries of the sync endpoints, for `unittest.TestCase` classes.
+
+    The endpoints are called with the first SMALL_SCALE records, then with LARGE_SCALE
+    records. Their query counts must be the same: an N+1 would make the second one larger.
+    """
+
+    def assertQueryBudget(self, call, small_arg, large_arg):
+        small_count = count_queries(call, small_arg)
+        large_count = count_queries(call, large_arg)
+
+        self.assertEqual(small_count, large_count,
+                         f'{large_count} queries for {large_arg}, {small_count} for {small_arg}')
+
+    def assertNamesQueryBudget(self, call, names):
+        self.assertQueryBudget(call, names[:SMALL_SCALE], names[:LARGE_SCALE])
@@ -0,0 +1,300 @@
+import base64
+import json
+import time
+
+import redis
+
+# Frappe imports
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+# How many values we put in a single `in (...)` condition. Keeps the generated SQL
+# bounded even when PythaCore asks for very large pages.
+IN_CHUNK_SIZE = 1000
+
+# Date fields set once a document is synchronised, see `get_sync_filters`.
+SYNC_DATE_FIELDS = ('winbooks_sync_date',)
+
+# Default and maximum number of records returned by a page of a paginated export.
+DEFAULT_PAGE_LENGTH = 500
+MAX_PAGE_LENGTH = 5000
+
+# Used when neither `redis_cache` nor `redis_queue` is set in the config.
+DEFAULT_REDIS_URL = 'redis://127.0.0.1:13000'
+
+# Redis connection pools by URL, created on first use and shared by all the jobs and
+# callbacks of the process.
+_redis_pools = {}
+
+# Progress hashes expire after a day so that finished synchronisations don't leave keys behind.
+PROGRESS_TTL = 24 * 60 * 60
+
+# Minimum delay between two progress events with the same message, in seconds.
+PROGRESS_PUBLISH_INTERVAL = 0.5
+
+# Timeout of the synchronisation background jobs, in seconds.
+SYNC_JOB_TIMEOUT = 6000
+
+# How many synchronisations may run at the same time on a site, unless
+# `pythacore_max_concurrent_syncs` is set in the site config.
+DEFAULT_MAX_CONCURRENT_SYNCS = 2
+
+
+def chunk(values, size=IN_CHUNK_SIZE):
+    """Yield successive `size`-sized slices of `values`."""
+    values = list(values)
+
+    for idx in range(0, len(values), size):
+        yield values[idx:idx + size]
+
+
+def parse_fields(fields) -> list:
+    """Parse the `fields` argument of a whitelisted method the same way `frappe.get_all` does."""
+    if isinstance(fields, str):
+        try:
+            fields = json.loads(fields)
+        except ValueError:
+            fields = [field.strip() for field in fields.split(',')]
+
+    return list(fields or [])
+
+
+def with_extra_fields(fields, extra_fields):
+    """Return `fields` completed with `extra_fields` and the list of fields we had to add.
+
+    The caller is expected to remove the added fields from the results so that the
+    response stays the same as the one requested.
+    """
+    fields = parse_fields(fields)
+
+    if '*' in fields:
+        return fields, []
+
+    added = [field for field in extra_fields if field not in fields]
+
+    return fields + added, added
+
+
+def remove_fields(rows, fields) -> None:
+    for row in rows:
+        for field in fields:
+            row.pop(field, None)
+
+
+def normalize_filters(filters) -> list:
+    """Return `filters` as a list of `[fieldname, operator, value]` conditions."""
+    filters = frappe.parse_json(filters) if isinstance(filters, str) else filters
+
+    if not filters:
+        return []
+
+    if isinstance(filters, dict):
+        return [[fieldname, value[0], value[1]] if isinstance(value, (list, tuple)) else [fieldname, '=', value]
+                for fieldname, value in filters.items()]
+
+    # Keep the SQL conditions of `get_sync_filters` as they are.
+    return [condition if isinstance(condition, str) else list(condition) for condition in filters]
+
+
+def get_sync_filters(doctype, filters) -> list:
+    """Return `filters` with its `set`/`not set` conditions on `SYNC_DATE_FIELDS` written as SQL.
+
+    Frappe compiles `[field, 'is', 'not set']` to `ifnull(field, '') = ''`, which cannot use
+    an index. These date fields are null until a document is synchronised, so the condition
+    is written as `field is null` instead, which the sync indexes of `pythacore.indexes` serve.
+    """
+    sync_filters = []
+
+    for condition in normalize_filters(filters):
+        # Raw SQL conditions are only added here, they are never accepted from the request.
+        if isinstance(condition, str):
+            frappe.throw(_('Invalid filter: {0}').format(condition))
+
+        fieldname, operator, value = condition[-3:]
+
+        if fieldname in SYNC_DATE_FIELDS and operator.lower() == 'is' and value in ('set', 'not set'):
+            sync_filters.append('`tab{0}`.`{1}` is {2}null'.format(
+                doctype, fieldname, 'not ' if value == 'set' else ''))
+        else:
+            sync_filters.append(condition)
+
+    return sync_filters
+
+
+def encode_cursor(modified, name) -> str:
+    """Return an opaque cursor pointing right after the record (`modified`, `name`)."""
+    value = json.dumps([str(modified), name])
+
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the (`modified`, `name`) pair encoded by `encode_cursor`."""
+    try:
+        modified, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        frappe.throw(_('Invalid pagination cursor.'), title=_('Invalid Cursor'))
+
+    return modified, name
+
+
+def get_page_length(page_length) -> int:
+    page_length = cint(page_length) or DEFAULT_PAGE_LENGTH
+
+    return min(page_length, MAX_PAGE_LENGTH)
+
+
+def get_page(doctype, fields, filters, cursor=None, page_length=None):
+    """Return one page of records ordered by (`modified`, `name`) and the cursor of the next page.
+
+    This is keyset pagination: the cursor holds the position of the last record of the
+    page, so a page can be fetched again with the same cursor if it failed, and the
+    database never has to skip over the records of the previous pages. The next cursor
+    is `None` once the last page has been reached.
+    """
+    fields, added_fields = with_extra_fields(fields, ['modified', 'name'])
+    page_length = get_page_length(page_length)
+    filters = normalize_filters(filters)
+    or_filters = None
+
+    if cursor:
+        modified, name = decode_cursor(cursor)
+        # (modified, name) > (cursor modified, cursor name)
+        filters.append(['modified', '>=', modified])
+        or_filters = [['modified', '>', modified], ['name', '>', name]]
+
+    records = frappe.db.get_all(
+        doctype,
+        fields=fields,
+        filters=filters,
+        or_filters=or_filters,
+        order_by=f"`tab{doctype}`.modified asc, `tab{doctype}`.name asc",
+        page_length=page_length
+    )
+
+    next_cursor = None
+
+    if len(records) == page_length:
+        next_cursor = encode_cursor(
+            records[-1]['modified'], records[-1]['name'])
+
+    remove_fields(records, added_fields)
+
+    return records, next_cursor
+
+
+def get_redis_connection() -> redis.Redis:
+    """Return a client of the shared Redis connection pool.
+
+    The URL is read from `redis_cache`, then `redis_queue`, in the config. The pool is
+    created once per process, so jobs and callbacks reuse its connections instead of
+    opening new sockets.
+    """
+    url = frappe.conf.get('redis_cache') or frappe.conf.get(
+        'redis_queue') or DEFAULT_REDIS_URL
+    pool = _redis_pools.get(url)
+
+    if pool is None:
+        pool = _redis_pools.setdefault(
+            url, redis.ConnectionPool.from_url(url))
+
+    return redis.Redis(connection_pool=pool)
+
+
+def set_progress(conn, key, current: int, total: int = None) -> None:
+    """Store the progress of a synchronisation, and refresh its TTL, in one round trip."""
+    progress = {'progress_current': current}
+
+    if total is not None:
+        progress['progress_total'] = total
+
+    pipeline = conn.pipeline()
+    pipeline.hset(key, mapping=progress)
+    pipeline.expire(key, PROGRESS_TTL)
+    pipeline.execute()
+
+
+def increment_progress(conn, key, step: int = 1):
+    """Add `step` to the progress of a synchronisation and return (current, total).
+
+    The increment and the read run in one MULTI/EXEC round trip, so concurrent updaters
+    never overwrite each other's steps.
+    """
+    pipeline = conn.pipeline()
+    pipeline.hincrby(key, 'progress_current', step)
+    pipeline.hget(key, 'progress_total')
+    pipeline.expire(key, PROGRESS_TTL)
+    current, total = pipeline.execute()[:2]
+
+    return current, int(total or 0)
+
+
+def get_sync_queue() -> str:
+    """Return the RQ queue of the synchronisation jobs (`pythacore_sync_queue` in the site config).
+
+    A queue other than `default`, `short` and `long` needs its own worker, started with
+    `bench worker --queue <queue>`.
+    """
+    return frappe.conf.get('pythacore_sync_queue') or 'long'
+
+
+def acquire_sync_lock(sync_doc_name) -> bool:
+    """Lock a synchronisation while its job is queued or running.
+
+    Return False if it is already locked. The lock is a Redis key of the site set with
+    NX, so it also holds across concurrent requests. It expires after `SYNC_JOB_TIMEOUT`
+    in case the job is lost without releasing it.
+    """
+    cache = frappe.cache()
+
+    return bool(cache.set(get_sync_lock_key(sync_doc_name), 1, nx=True, ex=SYNC_JOB_TIMEOUT))
+
+
+def release_sync_lock(sync_doc_name) -> None:
+    frappe.cache().delete(get_sync_lock_key(sync_doc_name))
+
+
+def get_sync_lock_key(sync_doc_name) -> str:
+    return frappe.cache().make_key(f'pythacore_sync_lock|{sync_doc_name}')
+
+
+def acquire_sync_slot(holder) -> bool:
+    """Take one of the synchronisation slots of the site for `holder`, without waiting.
+
+    Return False if all the slots are taken, the caller is expected to fail fast rather
+    than wait in a worker. Slots are members of a Redis sorted set scored by their expiry
+    date, so a slot that is never released is freed after `SYNC_JOB_TIMEOUT`. A holder
+    which already has a slot keeps it and its expiry is pushed back.
+    """
+    cache = frappe.cache()
+    key = get_sync_slots_key()
+    limit = cint(frappe.conf.get('pythacore_max_concurrent_syncs')
+                 ) or DEFAULT_MAX_CONCURRENT_SYNCS
+    now = time.time()
+
+    pipeline = cache.pipeline()
+    pipeline.zremrangebyscore(key, '-inf', now)
+    pipeline.zscore(key, holder)
+    pipeline.zadd(key, {holder: now + SYNC_JOB_TIMEOUT})
+    pipeline.zrank(key, holder)
+    held, rank = pipeline.execute()[1::2]
+
+    if held is not None or rank < limit:
+        return True
+
+    cache.zrem(key, holder)
+
+    return False
+
+
+def release_sync_slot(holder) -> None:
+    frappe.cache().zrem(get_sync_slots_key(), holder)
+
+
+def get_sync_slot_holder(sync_doctype, sync_name) -> str:
+    return f'{sync_doctype}|{sync_name}'
+
+
+def get_sync_slots_key() -> str:
+    return frappe.cache().make_key('pythacore_sync_slots')
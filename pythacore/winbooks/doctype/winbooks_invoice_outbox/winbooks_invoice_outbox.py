@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2026, Kano Solutions and contributors
+# For license information, please see license.txt
+
+# System imports
+import json
+
+# Frappe imports
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import now_datetime
+from frappe.utils.response import json_handler
+
+# Local imports
+from pythacore.metrics import measure_phase
+from pythacore.utils import chunk, decode_cursor, encode_cursor, get_page_length, get_sync_filters, parse_fields
+from pythacore.wire import make_response
+
+OUTBOX_DOCTYPES = ['Sales Invoice', 'Purchase Invoice']
+
+# Header fields stored in the outbox record of an invoice, which don't change once it is
+# submitted. The other fields requested by PythaCore, such as `status` or
+# `outstanding_amount`, are read from the invoice itself when the outbox is served.
+OUTBOX_FIELDS = {
+    'Sales Invoice': ['name', 'naming_series', 'company', 'posting_date', 'due_date', 'customer',
+                      'customer_name', 'tax_id', 'currency', 'conversion_rate', 'is_return',
+                      'return_against', 'net_total', 'base_net_total', 'total_taxes_and_charges',
+                      'base_total_taxes_and_charges', 'grand_total', 'base_grand_total'],
+    'Purchase Invoice': ['name', 'naming_series', 'company', 'posting_date', 'due_date', 'supplier',
+                         'supplier_name', 'tax_id', 'bill_no', 'bill_date', 'currency', 'conversion_rate',
+                         'is_return', 'return_against', 'net_total', 'base_net_total',
+                         'total_taxes_and_charges', 'base_total_taxes_and_charges', 'grand_total',
+                         'base_grand_total']
+}
+
+
+class WinbooksInvoiceOutbox(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index('Winbooks Invoice Outbox', ['reference_doctype', 'reference_name'])
+    # Serves the range reads of `get_outbox_records`, in their order.
+    frappe.db.add_index('Winbooks Invoice Outbox',
+                        ['reference_doctype', 'winbooks_sync_date', 'cancelled', 'posting_date', 'reference_name'])
+
+
+def add_outbox_record(doc) -> None:
+    """Store the export-ready record of a submitted invoice: its header fields and its VAT."""
+    # Imported here since the synchronisation module imports this one.
+    from pythacore.winbooks.doctype.winbooks_synchronisation.winbooks_synchronisation import get_vat_from_taxes
+
+    invoice = {field: doc.get(field) for field in get_outbox_fields(doc.doctype)}
+    invoice['winbooks_sync_date'] = doc.get('winbooks_sync_date')
+
+    if doc.get('vat_data'):
+        vat_data = json.loads(doc.vat_data)
+        invoice['vat_amount'], invoice['vat_breakup'] = vat_data['total_vat_amount'], vat_data['vat_code_breakup']
+    else:
+        invoice['vat_amount'], invoice['vat_breakup'] = get_vat_from_taxes(doc.get('taxes') or [])
+
+    # The record is written in the transaction of the submission, without the overhead of
+    # `insert`, so that it exists if and only if the invoice is submitted.
+    insert_outbox_records(doc.doctype, [invoice])
+
+
+def insert_outbox_records(doctype, invoices) -> None:
+    """Insert the outbox records of the given invoices in bulk.
+
+    Each invoice is a dict with the fields of `get_outbox_fields`, `winbooks_sync_date`,
+    `vat_amount` and `vat_breakup`.
+    """
+    now = now_datetime()
+    user = frappe.session.user
+    outbox_fields = get_outbox_fields(doctype)
+    fields = ['name', 'creation', 'modified', 'owner', 'modified_by', 'docstatus', 'reference_doctype',
+              'reference_name', 'posting_date', 'cancelled', 'winbooks_sync_date', 'vat_amount',
+              'vat_breakup', 'data']
+    values = []
+
+    for invoice in invoices:
+        data = {field: invoice.get(field) for field in outbox_fields}
+        values.append([frappe.generate_hash(length=10), now, now, user, user, 0, doctype, invoice['name'],
+                       invoice['posting_date'], 0, invoice.get('winbooks_sync_date'), invoice['vat_amount'],
+                       json.dumps(invoice['vat_breakup']), json.dumps(data, default=json_handler)])
+
+    frappe.db.bulk_insert('Winbooks Invoice Outbox', fields, values)
+
+
+def get_outbox_fields(doctype) -> list:
+    """Return the fields of `OUTBOX_FIELDS` that exist on the site and can't be changed after submission."""
+    meta = frappe.get_meta(doctype)
+
+    return [field for field in OUTBOX_FIELDS[doctype]
+            if field == 'name' or (meta.has_field(field) and not meta.get_field(field).allow_on_submit)]
+
+
+def cancel_outbox_record(doctype, name) -> None:
+    frappe.db.sql("""
+        update `tabWinbooks Invoice Outbox`
+        set cancelled = 1
+        where reference_doctype = %s and reference_name = %s
+    """, (doctype, name))
+
+
+def set_outbox_sync_date(doctype, names, sync_date) -> None:
+    """Stamp `winbooks_sync_date` on the outbox records of the given invoices."""
+    for names_chunk in chunk(names):
+        frappe.db.sql("""
+            update `tabWinbooks Invoice Outbox`
+            set winbooks_sync_date = %s
+            where reference_doctype = %s and reference_name in %s
+        """, (sync_date, doctype, tuple(names_chunk)))
+
+
+@frappe.whitelist()
+def get_outbox_invoices(doctype, fields, up_to=None, cursor=None, page_length=None, filters=None,
+                        sync_doc_name=None):
+    """Return a page of the submitted invoices not synchronised yet, from the outbox.
+
+    Unlike `get_invoices`, this is one indexed range read over the outbox, ordered by
+    (`posting_date`, name), up to the posting date `up_to`. The requested fields of
+    `OUTBOX_FIELDS` are read from the record stored at submission, along with `vat_amount`
+    and `vat_breakup`. The other fields, which may change after submission, are read from
+    the invoices of the page with one query, along with the `filters`. The invoices which
+    don't match the `filters` are left out, so a page may hold less than `page_length`
+    invoices while there are more pages.
+    """
+    if doctype not in OUTBOX_DOCTYPES:
+        frappe.throw(_('{0} is not exported through the outbox.').format(doctype))
+
+    frappe.has_permission(doctype, 'read', throw=True)
+
+    with measure_phase('Winbooks Synchronisation', sync_doc_name, 'get_invoices') as metrics:
+        fields = parse_fields(fields)
+        page_length = get_page_length(page_length)
+        records = get_outbox_records(doctype, up_to, decode_cursor(cursor) if cursor else None, page_length)
+        outbox_fields = get_outbox_fields(doctype)
+        live_fields = ['*'] if '*' in fields else [field for field in fields if field not in outbox_fields]
+        live_invoices = get_live_invoices(doctype, [record.reference_name for record in records],
+                                          live_fields, filters)
+        invoices = []
+
+        for record in records:
+            if live_invoices is not None and record.reference_name not in live_invoices:
+                continue
+
+            invoice = json.loads(record.data)
+
+            if live_invoices is not None:
+                invoice.update(live_invoices[record.reference_name])
+
+            if '*' not in fields:
+                invoice = {field: invoice.get(field) for field in fields}
+
+            invoice['vat_amount'] = record.vat_amount
+            invoice['vat_breakup'] = json.loads(record.vat_breakup)
+            invoices.append(invoice)
+
+        next_cursor = None
+
+        if len(records) == page_length:
+            next_cursor = encode_cursor(records[-1].posting_date, records[-1].reference_name)
+
+        metrics.documents = len(invoices)
+
+    return make_response({'data': invoices, 'cursor': next_cursor})
+
+
+def get_live_invoices(doctype, names, fields, filters):
+    """Return the `fields` of the invoices matching `filters` among `names`, by name.
+
+    Return None when there are neither fields nor filters to read from the invoices.
+    """
+    filters = get_sync_filters(doctype, filters)
+
+    if len(fields) == 0 and len(filters) == 0:
+        return None
+
+    fields = fields if '*' in fields else fields + ['name']
+    invoices = {}
+
+    for names_chunk in chunk(names):
+        for invoice in frappe.db.get_all(doctype, fields=fields, filters=filters + [['name', 'in', names_chunk]]):
+            invoices[invoice['name']] = invoice
+
+    return invoices
+
+
+def get_outbox_records(doctype, up_to=None, after=None, limit=None) -> list:
+    conditions = ['reference_doctype = %(doctype)s', 'winbooks_sync_date is null', 'cancelled = 0']
+    values = {'doctype': doctype, 'limit': limit}
+
+    if up_to:
+        conditions.append('posting_date <= %(up_to)s')
+        values['up_to'] = up_to
+
+    if after:
+        conditions.append('(posting_date, reference_name) > (%(after_date)s, %(after_name)s)')
+        values['after_date'], values['after_name'] = after
+
+    return frappe.db.sql(f"""
+        select reference_name, posting_date, vat_amount, vat_breakup, data
+        from `tabWinbooks Invoice Outbox`
+        where {' and '.join(conditions)}
+        order by posting_date asc, reference_name asc
+        limit %(limit)s
+    """, values, as_dict=True)
+
+
+def fill_outbox(chunk_size=500) -> None:
+    """Add the submitted invoices not synchronised yet to the outbox, e.g. on installation.
+
+    Invoices which already have a record are skipped, so it can be run again. The invoices
+    are read, and their VAT computed, a chunk at a time as `get_invoices` does.
+    """
+    # Imported here since the synchronisation module imports this one.
+    from pythacore.winbooks.doctype.winbooks_synchronisation.winbooks_synchronisation import (get_vat_fields,
+                                                                                             set_vat)
+
+    for doctype in OUTBOX_DOCTYPES:
+        if not frappe.db.has_column(doctype, 'winbooks_sync_date'):
+            continue
+
+        names = frappe.db.sql_list(f"""
+            select invoice.name
+            from `tab{doctype}` invoice
+            where invoice.docstatus = 1
+                and invoice.winbooks_sync_date is null
+                and not exists (
+                    select 1
+                    from `tabWinbooks Invoice Outbox` outbox
+                    where outbox.reference_doctype = %s and outbox.reference_name = invoice.name
+                )
+        """, (doctype,))
+        fields = get_outbox_fields(doctype) + ['winbooks_sync_date']
+        fields += [field for field in get_vat_fields(doctype) if field not in fields]
+
+        for names_chunk in chunk(names, chunk_size):
+            invoices = frappe.db.get_all(doctype, fields=fields, filters={'name': ['in', names_chunk]})
+
+            set_vat(doctype, invoices)
+            insert_outbox_records(doctype, invoices)
+
+            frappe.db.commit()
@@ -1,8 +1,8 @@
 from __future__ import unicode_literals
 
 # System imports
-import redis
 import json
+import time
 from decimal import Decimal
 
 # Local imports
@@ -10,6 +10,9 @@ import frappe
 from datetime import datetime, date
 from frappe import _
 from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
+from pythacore.metrics import measure_phase
+from pythacore.utils import (PROGRESS_PUBLISH_INTERVAL, get_redis_connection,
+                             increment_progress, set_progress)
 
 # How many steps do we have at initialization? Used for progress tracking.
 # - Init sync
@@ -22,12 +25,15 @@ INITIAL_STEPS = 2
 DOCTYPE_STEPS = 2
 
 class SyncJob:
-    def __init__(self, sync_doc, console=False):
+    def __init__(self, sync_doc, console=False, resume=False):
         self.sync_doc = sync_doc
         self.console = console
+        self.resume = resume
         self.listeners = {}
         self.documents = []
-        self.redis = redis.Redis.from_url('redis://127.0.0.1:13000')
+        self.redis = get_redis_connection()
+        self.progress_message = None
+        self.progress_published_at = 0
         self.purchase_invoices = { 'count': 0, 'range': '' }
         self.sales_invoices = { 'count': 0, 'range': '' }
         self.customers = { 'count': 0, 'range': '' }
@@ -50,23 +56,29 @@ class SyncJob:
         if self.sync_doc.sync_purchase_invoices:
             self.progress_total += 1 * DOCTYPE_STEPS
 
-        self.set_status('In Progress')
-        self.init_progress()
-        self.update_progress(message='Starting synchronisation...')
-
-        frappe.publish_realtime(
-            event='start_sync',
-            message={
-                'winbooks_sync': self.sync_doc.name,
-                'sync_si_up_to': self.sync_doc.sync_si_up_to,
-                'sync_pi_up_to': self.sync_doc.sync_pi_up_to,
-                'sync_customers': self.sync_doc.sync_customers,
-                'sync_suppliers': self.sync_doc.sync_suppliers,
-                'sync_sales_invoices': self.sync_doc.sync_sales_invoices,
-                'sync_purchase_invoices': self.sync_doc.sync_purchase_invoices
-            },
-            room='pythacore:winbooks'
-        )
+        with measure_phase('Winbooks Synchronisation', self.sync_doc.name, 'start'):
+            self.set_status('In Progress')
+            self.init_progress()
+            self.update_progress(message='Starting synchronisation...')
+
+            frappe.publish_realtime(
+                event='start_sync',
+                message={
+                    'winbooks_sync': self.sync_doc.name,
+                    'sync_si_up_to': self.sync_doc.sync_si_up_to,
+                    'sync_pi_up_to': self.sync_doc.sync_pi_up_to,
+                    'sync_customers': self.sync_doc.sync_customers,
+                    'sync_suppliers': self.sync_doc.sync_suppliers,
+                    'sync_sales_invoices': self.sync_doc.sync_sales_invoices,
+                    'sync_purchase_invoices': self.sync_doc.sync_purchase_invoices,
+                    # On resume, the documents acknowledged by a checkpoint are already
+                    # stamped and are not returned by the getters anymore.
+                    'resume': self.resume,
+                    'last_checkpoint': str(self.sync_doc.last_checkpoint) if self.sync_doc.last_checkpoint else None,
+                    'checkpointed_documents': self.sync_doc.checkpointed_documents or 0
+                },
+                room='pythacore:winbooks'
+            )
 
     def refresh_form(self) -> None:
         frappe.publish_realtime(
@@ -77,38 +89,23 @@ class SyncJob:
     def init_progress(self) -> None:
         self.cache_progress(0, self.progress_total)
 
-    # We convert the integer params to strings so that we can easily decode them
-    # when we will fetch them because redis stores data in binary format.
     def cache_progress(self, current: int, total: int = None) -> None:
-        print(f"Caching progress current {current} total {total}")
-        self.redis.hset(
-            self.sync_doc.name,
-            'progress_current',
-            str(current)
-        )
-
-        if total is not None:
-            self.redis.hset(
-                self.sync_doc.name,
-                'progress_total',
-                str(total)
-            )
+        set_progress(self.redis, self.sync_doc.name, current, total)
 
     def update_progress(self, step: int = 1, message: str = '') -> None:
-        total = self.redis.hget(
-            self.sync_doc.name,
-            'progress_total'
-        )
-        current = self.redis.hget(
-            self.sync_doc.name,
-            'progress_current'
-        )
+        current, total = increment_progress(
+            self.redis, self.sync_doc.name, step)
+
+        # Fine-grained steps would flood the socket.io channel, so an update with the same
+        # message as the previous one is only published once in a while.
+        now = time.monotonic()
 
-        total = int(total)
-        current = int(current)
-        current += step
+        if message == self.progress_message and current < total \
+                and now - self.progress_published_at < PROGRESS_PUBLISH_INTERVAL:
+            return
 
-        self.cache_progress(current)
+        self.progress_message = message
+        self.progress_published_at = now
 
         frappe.publish_realtime(
             event='winbooks_sync_progress',
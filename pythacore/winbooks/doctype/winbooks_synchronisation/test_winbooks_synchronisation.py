@@ -1,8 +1,104 @@
 # Copyright (c) 2021, Kano Solutions and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 import unittest
 
-class TestWinbooksSynchronisation(unittest.TestCase):
-	pass
+from pythacore.indexes import add_sync_indexes
+from pythacore.tests.benchmark import call_with_request
+from pythacore.tests.synthetic_data import create_sync_doc, create_synthetic_data, delete_synthetic_data
+from pythacore.tests.utils import LARGE_SCALE, QueryBudgetMixin, get_filters
+from pythacore.utils import get_sync_filters
+from pythacore.winbooks.doctype.winbooks_invoice_outbox.winbooks_invoice_outbox import fill_outbox, get_outbox_invoices
+from pythacore.winbooks.doctype.winbooks_synchronisation import winbooks_synchronisation
+
+TEST_PREFIX = 'PYTHATEST-WB'
+
+class TestWinbooksSynchronisation(QueryBudgetMixin, unittest.TestCase):
+	@classmethod
+	def setUpClass(cls):
+		delete_synthetic_data(TEST_PREFIX)
+		cls.data = create_synthetic_data(LARGE_SCALE, TEST_PREFIX)
+		cls.sync_doc_name = create_sync_doc(TEST_PREFIX)
+
+	@classmethod
+	def tearDownClass(cls):
+		frappe.db.rollback()
+		delete_synthetic_data(TEST_PREFIX)
+
+	def test_get_invoices_query_budget(self):
+		for doctype, names in (('Sales Invoice', self.data.sales_invoices), ('Purchase Invoice', self.data.purchase_invoices)):
+			self.assertNamesQueryBudget(lambda names: winbooks_synchronisation.get_invoices(
+				doctype, ['name', 'grand_total'], get_filters(names), 0, 'name asc'), names)
+			self.assertNamesQueryBudget(lambda names: winbooks_synchronisation.get_invoices_page(
+				doctype, ['name', 'grand_total'], get_filters(names), page_length=len(names)), names)
+
+	def test_get_invoices_legacy_vat(self):
+		# Invoices without `vat_data` must get the VAT the per-document `old_get_vat` computes.
+		for doctype, names in (('Sales Invoice', self.data.sales_invoices), ('Purchase Invoice', self.data.purchase_invoices)):
+			legacy_names = frappe.get_all(doctype, filters={'name': ['in', names], 'vat_data': ['is', 'not set']}, pluck='name')
+			self.assertTrue(legacy_names)
+
+			invoices = winbooks_synchronisation.get_invoices(
+				doctype, ['name'], {'name': ['in', legacy_names]}, 0, 'name asc')
+
+			for invoice in invoices:
+				vat_amount, vat_breakup = winbooks_synchronisation.old_get_vat(frappe.get_doc(doctype, invoice['name']))
+				self.assertEqual(invoice['vat_amount'], vat_amount)
+				self.assertEqual(invoice['vat_breakup'], vat_breakup)
+
+	def test_outbox_matches_get_invoices(self):
+		fill_outbox()
+		names = self.data.sales_invoices
+		# `status` and `outstanding_amount` change after submission, they must be read from the invoice.
+		frappe.db.set_value('Sales Invoice', names[0], 'status', 'Paid', update_modified=False)
+		fields = ['name', 'customer', 'grand_total', 'status', 'outstanding_amount']
+		filters = [['name', 'in', names], ['status', '!=', 'Cancelled'], ['winbooks_sync_date', 'is', 'not set']]
+
+		invoices = winbooks_synchronisation.get_invoices('Sales Invoice', fields, filters, 0, 'name asc')
+		outbox_invoices = get_outbox_invoices('Sales Invoice', fields, filters=filters, page_length=5000)['data']
+
+		self.assertEqual(sorted(invoices, key=lambda invoice: invoice['name']),
+			sorted(outbox_invoices, key=lambda invoice: invoice['name']))
+
+	def test_sync_filters_use_index(self):
+		# `is not set` must be sent as `is null` for the sync indexes to be usable.
+		add_sync_indexes()
+
+		for doctype, columns in (('Sales Invoice', ['winbooks_sync_date', 'status']), ('Customer', ['winbooks_sync_date', 'disabled'])):
+			filters = [['winbooks_sync_date', 'is', 'not set']]
+			query = frappe.db.get_all(doctype, fields=['name'], filters=get_sync_filters(doctype, filters), run=0)
+			plan = frappe.db.sql(f'explain {query}', as_dict=True)[0]
+
+			self.assertIn(frappe.db.get_index_name(columns), plan.possible_keys or '')
+
+	def test_get_all_customers_query_budget(self):
+		for changed_only in (0, 1):
+			self.assertNamesQueryBudget(lambda names: winbooks_synchronisation.get_all_customers(
+				['name', 'customer_name'], get_filters(names), 0, changed_only=changed_only), self.data.customers)
+			self.assertNamesQueryBudget(lambda names: winbooks_synchronisation.get_all_customers_page(
+				['customer_name'], get_filters(names), page_length=len(names), changed_only=changed_only), self.data.customers)
+
+	def test_get_all_suppliers_query_budget(self):
+		for changed_only in (0, 1):
+			self.assertNamesQueryBudget(lambda names: winbooks_synchronisation.get_all_suppliers(
+				['name', 'supplier_name'], get_filters(names), 0, changed_only=changed_only), self.data.suppliers)
+			self.assertNamesQueryBudget(lambda names: winbooks_synchronisation.get_all_suppliers_page(
+				['supplier_name'], get_filters(names), page_length=len(names), changed_only=changed_only), self.data.suppliers)
+
+	def test_set_success_query_budget(self):
+		def set_success(names):
+			docs = [{'doctype': 'Sales Invoice', 'name': name} for name in names]
+			call_with_request(winbooks_synchronisation.set_success, {'docs': docs}, sync_doc_name=self.sync_doc_name, defer=0)
+
+		self.assertNamesQueryBudget(set_success, self.data.sales_invoices)
+
+	def test_abort_query_budget(self):
+		def abort(names):
+			docs = [{'doctype': 'Sales Invoice', 'name': name} for name in names]
+			call_with_request(winbooks_synchronisation.abort, {
+				'docs': docs,
+				'reason': {'type': 'error', 'message': 'Test'}
+			}, sync_doc_name=self.sync_doc_name, defer=0)
+
+		self.assertNamesQueryBudget(abort, self.data.sales_invoices)
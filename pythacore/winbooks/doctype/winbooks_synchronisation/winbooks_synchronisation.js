@@ -74,12 +74,12 @@ frappe.ui.form.on('Winbooks Synchronisation', {
 			} else {
 				if (frm.doc.status === 'Pending') {
 					frm.page.set_primary_action(__('Start Synchronisation'), () => frm.events.start_sync(frm));
+				} else if (frm.doc.last_checkpoint) {
+					// Resume from the last checkpoint, or start over with a new synchronisation.
+					frm.page.set_primary_action(__('Resume'), () => frm.events.resume_sync(frm));
+					frm.add_custom_button(__('Retry'), () => frm.events.retry_sync(frm));
 				} else {
-					frm.page.set_primary_action(__('Retry'), () => {
-						frm.trigger('hide_sync_details')
-						frm.trigger('hide_error')
-						frappe.new_doc('Winbooks Synchronisation')
-					});
+					frm.page.set_primary_action(__('Retry'), () => frm.events.retry_sync(frm));
 				}
 			}
 		}
@@ -139,14 +139,115 @@ frappe.ui.form.on('Winbooks Synchronisation', {
 			});
 	},
 
+	resume_sync(frm) {
+		frm
+			.call({
+				method: 'form_resume_sync',
+				args: { sync_doc_name: frm.doc.name },
+				btn: frm.page.btn_primary
+			})
+			.then(r => {
+				if (r.message === true) {
+					frm.trigger('hide_error');
+					frm.trigger('hide_sync_details');
+					frm.disable_save();
+				}
+			});
+	},
+
+	retry_sync(frm) {
+		frm.trigger('hide_sync_details');
+		frm.trigger('hide_error');
+		frappe.new_doc('Winbooks Synchronisation');
+	},
+
 	hide_sync_details(frm) {
 		frm.toggle_display('sync_details_section', false);
 	},
 
 	show_sync_details(frm) {
+		frm.toggle_display('sync_details_section', false);
+		frm.get_field('sync_log_preview').$wrapper.empty();
+
+		if (frm.is_new() || frm.doc.status === 'Pending') return;
+
+		frm.sync_ledger = { start: 0, status: '' };
+		frm.events.load_sync_ledger(frm);
+	},
+
+	// The ledger is loaded page by page from the server instead of rendering every
+	// synchronised document at once.
+	load_sync_ledger(frm) {
+		frappe
+			.call({
+				method: 'pythacore.pythacore.doctype.sync_ledger.sync_ledger.get_sync_ledger',
+				args: {
+					sync_doctype: frm.doctype,
+					sync_name: frm.doc.name,
+					status: frm.sync_ledger.status,
+					start: frm.sync_ledger.start,
+					page_length: 100
+				}
+			})
+			.then(r => {
+				let { entries, total } = r.message;
+
+				// Synchronisations made before the ledger existed only have a JSON log.
+				if (total === 0 && frm.sync_ledger.start === 0 && !frm.sync_ledger.status && frm.doc.sync_log) {
+					frm.events.show_legacy_sync_log(frm);
+					return;
+				}
+
+				if (frm.sync_ledger.start === 0) {
+					frm.events.render_sync_ledger(frm, total);
+				}
+
+				frm.sync_ledger.start += entries.length;
+
+				let $wrapper = frm.get_field('sync_log_preview').$wrapper;
+				$wrapper.find('.sync-ledger-rows').append(entries.map(log => frm.events.get_sync_ledger_row(frm, log)).join(''));
+				$wrapper.find('.sync-ledger-more').toggle(frm.sync_ledger.start < total);
+			});
+	},
+
+	render_sync_ledger(frm, total) {
+		frm.toggle_display('sync_details_section', total > 0 || !!frm.sync_ledger.status);
+
+		let statuses = ['', 'Success', 'Warning', 'Error', 'Pending']
+			.map(status => `<option value="${status}" ${status === frm.sync_ledger.status ? 'selected' : ''}>
+				${status ? __(status) : __('All')}
+			</option>`)
+			.join('');
+
+		let $wrapper = frm.get_field('sync_log_preview').$wrapper;
+		$wrapper.html(`
+			<div class="form-group" style="max-width: 200px;">
+				<select class="form-control input-xs sync-ledger-status">${statuses}</select>
+			</div>
+			<table class="table table-bordered">
+				<thead>
+					<tr class="text-muted">
+						<th width="20%">${__('Document')}</th>
+						<th width="10%">${__('Status')}</th>
+						<th width="70%">${__('Message')}</th>
+					</tr>
+				</thead>
+				<tbody class="sync-ledger-rows"></tbody>
+			</table>
+			<button class="btn btn-default btn-xs sync-ledger-more">${__('Load More')}</button>
+		`);
+
+		$wrapper.find('.sync-ledger-status').on('change', e => {
+			frm.sync_ledger = { start: 0, status: $(e.target).val() };
+			frm.events.load_sync_ledger(frm);
+		});
+		$wrapper.find('.sync-ledger-more').on('click', () => frm.events.load_sync_ledger(frm));
+	},
+
+	show_legacy_sync_log(frm) {
 		let sync_log = JSON.parse(frm.doc.sync_log || '[]');
 		let logs = sync_log;
-		frm.toggle_display('sync_details_section', (frm.doc.status !== 'Pending' && logs.length > 0));
+		frm.toggle_display('sync_details_section', logs.length > 0);
 
 		if (logs.length === 0) {
 			frm.get_field('sync_log_preview').$wrapper.empty();
@@ -154,37 +255,12 @@ frappe.ui.form.on('Winbooks Synchronisation', {
 		}
 
 		let rows = logs
-			.map(log => {
-				let messageHtml = log.message ?? ''
-				let documentHtml = `${log.doctype}
-					<span class="underline">
-						${frappe.utils.get_form_link(
-					log.doctype,
-					log.name,
-					true
-				)}
-					<span>`;
-
-				let indicator_color = 'gray';
-				if (log.status === 'Success') indicator_color = 'green text-success';
-				else if (log.status === 'Warning') indicator_color = 'yellow text-warning';
-				else if (log.status === 'Error') indicator_color = 'red text-danger';
-
-				let title = __('Pending');
-				if (log.status === 'Success') title = __('Success');
-				else if (log.status === 'Warning') title = __('Warning');
-				else if (log.status === 'Error') title = __('Error');
-
-				return `<tr>
-					<td>${documentHtml}</td>
-					<td>
-						<div class="indicator ${indicator_color}">${title}</div>
-					</td>
-					<td>
-						${messageHtml}
-					</td>
-				</tr>`;
-			})
+			.map(log => frm.events.get_sync_ledger_row(frm, {
+				status: log.status,
+				reference_doctype: log.doctype,
+				reference_name: log.name,
+				message: log.message
+			}))
 			.join('');
 
 		frm.get_field('sync_log_preview').$wrapper.html(`
@@ -198,4 +274,36 @@ frappe.ui.form.on('Winbooks Synchronisation', {
 			</table>
 		`);
 	},
+
+	get_sync_ledger_row(frm, log) {
+		let messageHtml = log.message ?? ''
+		let documentHtml = `${log.reference_doctype}
+			<span class="underline">
+				${frappe.utils.get_form_link(
+			log.reference_doctype,
+			log.reference_name,
+			true
+		)}
+			<span>`;
+
+		let indicator_color = 'gray';
+		if (log.status === 'Success') indicator_color = 'green text-success';
+		else if (log.status === 'Warning') indicator_color = 'yellow text-warning';
+		else if (log.status === 'Error') indicator_color = 'red text-danger';
+
+		let title = __('Pending');
+		if (log.status === 'Success') title = __('Success');
+		else if (log.status === 'Warning') title = __('Warning');
+		else if (log.status === 'Error') title = __('Error');
+
+		return `<tr>
+			<td>${documentHtml}</td>
+			<td>
+				<div class="indicator ${indicator_color}">${title}</div>
+			</td>
+			<td>
+				${messageHtml}
+			</td>
+		</tr>`;
+	},
 });
@@ -11,11 +11,27 @@ from decimal import Decimal
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import now_datetime, flt
+from frappe.utils import cint, now_datetime, flt
 from frappe.utils.background_jobs import enqueue
 
 # Local imports
+from pythacore.metrics import measure_phase
+from pythacore.pythacore.doctype.sync_callback.sync_callback import (delete_sync_callbacks, queue_sync_callback,
+                                                                     should_defer)
+from pythacore.pythacore.doctype.sync_ledger.sync_ledger import delete_ledger_entries, set_ledger_entries
+from pythacore.party import get_changed_parties, get_changed_parties_page, set_addresses_and_contacts
+from pythacore.utils import (SYNC_JOB_TIMEOUT, acquire_sync_lock, acquire_sync_slot, chunk, get_page,
+                             get_sync_filters, get_sync_queue, get_sync_slot_holder, release_sync_lock,
+                             release_sync_slot, remove_fields, with_extra_fields)
+from pythacore.winbooks.doctype.winbooks_invoice_outbox.winbooks_invoice_outbox import OUTBOX_DOCTYPES, set_outbox_sync_date
 from pythacore.winbooks.doctype.winbooks_synchronisation.sync_job import SyncJob
+from pythacore.wire import get_request_body, make_response, read_payload
+
+# Child tables holding the taxes of the invoices we export.
+TAXES_DOCTYPES = {
+    'Sales Invoice': 'Sales Taxes and Charges',
+    'Purchase Invoice': 'Purchase Taxes and Charges'
+}
 
 
 class WinbooksSynchronisation(Document):
@@ -30,8 +46,11 @@ class WinbooksSynchronisation(Document):
             set_name=f"Synchronisation on {date} at {time}", force=True)
         self.sync_date = now
 
-    def queue_sync_job(self):
-        from frappe.core.page.background_jobs.background_jobs import get_info
+    def on_trash(self):
+        delete_ledger_entries(self.doctype, self.name)
+        delete_sync_callbacks(self.doctype, self.name)
+
+    def queue_sync_job(self, resume=False):
         from frappe.utils.scheduler import is_scheduler_inactive
 
         pythacore_online = frappe.cache().get('pythacore_online')
@@ -46,35 +65,49 @@ class WinbooksSynchronisation(Document):
                 _("Could not connect to PythaCore. Cannot start synchronisation."), title=_("PythaCore Offline")
             )
 
-        enqueued_jobs = [d.get("job_name") for d in get_info()]
+        # The lock is released by `start_sync_job` once the job is done.
+        if not acquire_sync_lock(self.name):
+            return False
 
-        if self.name not in enqueued_jobs:
+        try:
             enqueue(
                 start_sync_job,
-                queue="default",
-                timeout=6000,
+                queue=get_sync_queue(),
+                timeout=SYNC_JOB_TIMEOUT,
                 event="winbooks_sync",
                 job_name=self.name,
                 sync_doc_name=self.name,
+                resume=resume,
                 now=frappe.conf.developer_mode or frappe.flags.in_test,
             )
-            return True
+        except Exception:
+            release_sync_lock(self.name)
+            raise
 
-        return False
+        return True
 
 
-def start_sync_job(sync_doc_name):
+def start_sync_job(sync_doc_name, resume=False):
     """This method runs in background job"""
     sync_doc = frappe.get_doc("Winbooks Synchronisation", sync_doc_name)
 
     if sync_doc.status == 'Error':
         sync_doc.db_set('error_message', None)
 
+    slot_holder = get_sync_slot_holder("Winbooks Synchronisation", sync_doc_name)
+
     try:
-        worker = SyncJob(sync_doc)
+        # Limit how many synchronisations run at the same time. The slot is held until
+        # PythaCore sends the results, it is released once they are processed.
+        if not acquire_sync_slot(slot_holder):
+            frappe.throw(_('Too many synchronisations are running. Please try again later.'),
+                         title=_('Synchronisation Busy'))
+
+        worker = SyncJob(sync_doc, resume=resume)
         worker.sync()
     except Exception as e:
         frappe.db.rollback()
+        release_sync_slot(slot_holder)
         sync_doc.db_set("status", "Error")
         sync_doc.db_set('error_message', e)
         print(traceback.print_exc())
@@ -83,6 +116,8 @@ def start_sync_job(sync_doc_name):
             'winbooks_sync_refresh',
             {'winbooks_sync': sync_doc.name}
         )
+    finally:
+        release_sync_lock(sync_doc_name)
 
 
 def set_headline(self, headline) -> None:
@@ -126,150 +161,333 @@ def form_start_sync(sync_doc_name):
 
 
 @frappe.whitelist()
-def abort(sync_doc_name) -> None:
-    results = json.loads(frappe.request.data)
-
-    frappe.db.set_value('Winbooks Synchronisation',
-                        sync_doc_name, 'status', 'Error')
-    set_ranges(sync_doc_name, None)
+def form_resume_sync(sync_doc_name):
+    sync_doc = frappe.get_doc("Winbooks Synchronisation", sync_doc_name)
 
-    for doc in results['docs']:
-        if 'status' not in doc:
-            doc['status'] = 'Error'
-        elif len(doc['warning_codes']) > 0:
-            doc['message'] = ''
+    if not sync_doc.last_checkpoint or sync_doc.status == 'Success':
+        frappe.throw(_("This synchronisation has no checkpoint to resume from."), title=_("Cannot Resume"))
 
-            for idx, warning_code in enumerate(doc['warning_codes']):
-                if idx > 0:
-                    doc['message'] += '<br>'
+    return sync_doc.queue_sync_job(resume=True)
 
-                doc['message'] += f"- {get_warning_message(warning_code, doc['warning_data'])}"
 
-    message = ''
+@frappe.whitelist()
+def abort(sync_doc_name, defer=None) -> None:
+    if should_defer(defer):
+        queue_sync_callback('Winbooks Synchronisation', sync_doc_name,
+                            f'{__name__}.process_abort', get_request_body())
+        return
 
-    if results['reason']['type'] == 'fatal_warning':
-        message += '<b>'
-        message += _('Sorry, there is at least one problem that could not be solved automatically (see below for details).')
-        message += '</b><br><br>'
+    process_abort(sync_doc_name, read_payload())
 
-        if 'message' in results['reason']:
-            message += results['reason']['message']
-            message += '<br><br>'
 
-        message += '<b>'
-        message += _('The data was <u>NOT</u> imported into Winbooks.')
-        message += '</b>'
+def process_abort(sync_doc_name, results) -> None:
+    with measure_phase('Winbooks Synchronisation', sync_doc_name, 'abort') as metrics:
         frappe.db.set_value('Winbooks Synchronisation',
-                            sync_doc_name, 'warning_message', message)
-    else:
-        message += '<b>'
-        message += _('Sorry, there is at least one fatal error.')
-        message += '</b><br><br>'
-
-        if 'message' in results['reason']:
-            message += results['reason']['message']
-            message += '<br><br>'
-        elif 'error_code' in results['reason']:
-            message += get_error_message(results['reason']
-                                         ['error_code'], results['reason']['error_data'])
-            message += '<br><br>'
-
-        message += '<b>'
-        message += _('The data was <u>NOT</u> imported into Winbooks.')
-        message += '</b>'
+                            sync_doc_name, 'status', 'Error')
+        set_ranges(sync_doc_name, None)
+
+        for doc in results['docs']:
+            if 'status' not in doc:
+                doc['status'] = 'Error'
+            elif len(doc['warning_codes']) > 0:
+                set_warning_message(doc)
+
+        message = ''
+
+        if results['reason']['type'] == 'fatal_warning':
+            message += '<b>'
+            message += _('Sorry, there is at least one problem that could not be solved automatically (see below for details).')
+            message += '</b><br><br>'
+
+            if 'message' in results['reason']:
+                message += results['reason']['message']
+                message += '<br><br>'
+
+            message += '<b>'
+            message += _('The data was <u>NOT</u> imported into Winbooks.')
+            message += '</b>'
+            frappe.db.set_value('Winbooks Synchronisation',
+                                sync_doc_name, 'warning_message', message)
+        else:
+            message += '<b>'
+            message += _('Sorry, there is at least one fatal error.')
+            message += '</b><br><br>'
+
+            if 'message' in results['reason']:
+                message += results['reason']['message']
+                message += '<br><br>'
+            elif 'error_code' in results['reason']:
+                message += get_error_message(results['reason']
+                                             ['error_code'], results['reason']['error_data'])
+                message += '<br><br>'
+
+            message += '<b>'
+            message += _('The data was <u>NOT</u> imported into Winbooks.')
+            message += '</b>'
+            frappe.db.set_value('Winbooks Synchronisation',
+                                sync_doc_name, 'error_message', message)
+
+        set_ledger_entries('Winbooks Synchronisation', sync_doc_name,
+                           [get_ledger_entry(doc) for doc in results['docs']], keep_checkpoints=True)
+        frappe.db.commit()
+        # The synchronisation is over, let another one start.
+        release_sync_slot(get_sync_slot_holder('Winbooks Synchronisation', sync_doc_name))
+
+        frappe.publish_realtime(
+            'winbooks_sync_refresh',
+            {'sync_doc_name': sync_doc_name}
+        )
+
+        metrics.documents = len(results['docs'])
+
+
+@frappe.whitelist()
+def set_success(sync_doc_name, defer=None) -> None:
+    if should_defer(defer):
+        queue_sync_callback('Winbooks Synchronisation', sync_doc_name,
+                            f'{__name__}.process_success', get_request_body())
+        return
+
+    process_success(sync_doc_name, read_payload())
+
+
+def process_success(sync_doc_name, results) -> None:
+    with measure_phase('Winbooks Synchronisation', sync_doc_name, 'set_success') as metrics:
+        warnings_presence = False
+
         frappe.db.set_value('Winbooks Synchronisation',
-                            sync_doc_name, 'error_message', message)
+                            sync_doc_name, 'status', 'Success')
+        sync_date = frappe.db.get_value(
+            'Winbooks Synchronisation', sync_doc_name, 'sync_date')
 
-    frappe.db.set_value('Winbooks Synchronisation',
-                        sync_doc_name, 'sync_log', json.dumps(results['docs']))
-    frappe.db.commit()
+        set_sync_date(results['docs'], sync_date)
+
+        for doc in results['docs']:
+            if 'status' not in doc:
+                # PythaCore might have set the status to 'Warning'. If no status is set, we set it manually here.
+                doc['status'] = 'Success'
+            elif doc['status'] == 'Warning':
+                warnings_presence = True
+                set_warning_message(doc)
+
+        # If one or more docs have warning status, show a warning card at the top of the sync page.
+        if warnings_presence:
+            new_message = _(
+                "Winbooks gave at least one warning but don't worry, <b>it was taken care of automatically</b> (see below for details).")
+
+            if 'warning_message' in doc and doc.warning_message is not None:
+                new_message = doc.warning_message + "<br>" + new_message
+
+            frappe.db.set_value('Winbooks Synchronisation',
+                                sync_doc_name, 'warning_message', new_message)
+
+        if len(results['docs']) == 0:
+            frappe.db.set_value('Winbooks Synchronisation', sync_doc_name,
+                                'headline', _('Nothing to synchronise.'))
 
-    frappe.publish_realtime(
-        'winbooks_sync_refresh',
-        {'sync_doc_name': sync_doc_name}
-    )
+        set_ledger_entries('Winbooks Synchronisation', sync_doc_name,
+                           [get_ledger_entry(doc) for doc in results['docs']], keep_checkpoints=True)
+        frappe.db.commit()
+        # The synchronisation is over, let another one start.
+        release_sync_slot(get_sync_slot_holder('Winbooks Synchronisation', sync_doc_name))
+
+        frappe.publish_realtime('winbooks_sync_refresh', {
+                                'sync_doc_name': sync_doc_name})
+
+        metrics.documents = len(results['docs'])
 
 
 @frappe.whitelist()
-def set_success(sync_doc_name) -> None:
-    results = json.loads(frappe.request.data)
-    warnings_presence = False
+def checkpoint(sync_doc_name) -> None:
+    """Record a batch of documents that Winbooks has acknowledged during the synchronisation.
 
-    frappe.db.set_value('Winbooks Synchronisation',
-                        sync_doc_name, 'status', 'Success')
-    sync_date = frappe.db.get_value(
-        'Winbooks Synchronisation', sync_doc_name, 'sync_date')
+    The documents are stamped and added to the ledger right away, so that a resumed
+    synchronisation does not send them again. Checkpoints are never deferred: callbacks are
+    kept per synchronisation and method, so a queued checkpoint would replace the previous one.
+    """
+    process_checkpoint(sync_doc_name, read_payload())
 
-    for doc in results['docs']:
-        frappe.db.set_value(doc['doctype'], doc['name'],
-                            'winbooks_sync_date', sync_date)
 
-        if 'status' not in doc:
-            # PythaCore might have set the status to 'Warning'. If no status is set, we set it manually here.
-            doc['status'] = 'Success'
-        elif doc['status'] == 'Warning':
-            warnings_presence = True
-            doc['message'] = ''
+def process_checkpoint(sync_doc_name, results) -> None:
+    with measure_phase('Winbooks Synchronisation', sync_doc_name, 'checkpoint') as metrics:
+        sync_date = frappe.db.get_value(
+            'Winbooks Synchronisation', sync_doc_name, 'sync_date')
 
-            for idx, warning_code in enumerate(doc['warning_codes']):
-                if idx > 0:
-                    doc['message'] += '<br>'
+        set_sync_date(results['docs'], sync_date)
 
-                doc['message'] += f"- {get_warning_message(warning_code, doc['warning_data'])}"
+        for doc in results['docs']:
+            if 'status' not in doc:
+                doc['status'] = 'Success'
+            elif doc['status'] == 'Warning':
+                set_warning_message(doc)
 
-    # If one or more docs have warning status, show a warning card at the top of the sync page.
-    if warnings_presence:
-        new_message = _(
-            "Winbooks gave at least one warning but don't worry, <b>it was taken care of automatically</b> (see below for details).")
+        set_ledger_entries('Winbooks Synchronisation', sync_doc_name,
+                           [dict(get_ledger_entry(doc), checkpoint=1) for doc in results['docs']],
+                           keep_checkpoints=True)
 
-        if 'warning_message' in doc and doc.warning_message is not None:
-            new_message = doc.warning_message + "<br>" + new_message
+        checkpointed_documents = frappe.db.count('Sync Ledger', {
+            'sync_doctype': 'Winbooks Synchronisation',
+            'sync_name': sync_doc_name,
+            'checkpoint': 1
+        })
+        frappe.db.set_value('Winbooks Synchronisation', sync_doc_name, {
+            'last_checkpoint': now_datetime(),
+            'checkpointed_documents': checkpointed_documents
+        }, update_modified=False)
+        frappe.db.commit()
 
-        frappe.db.set_value('Winbooks Synchronisation',
-                            sync_doc_name, 'warning_message', new_message)
+        frappe.publish_realtime('winbooks_sync_refresh', {
+                                'sync_doc_name': sync_doc_name})
 
-    if len(results['docs']) == 0:
-        frappe.db.set_value('Winbooks Synchronisation', sync_doc_name,
-                            'headline', _('Nothing to synchronise.'))
+        metrics.documents = len(results['docs'])
 
-    frappe.db.set_value('Winbooks Synchronisation',
-                        sync_doc_name, 'sync_log', json.dumps(results['docs']))
-    frappe.db.commit()
 
-    frappe.publish_realtime('winbooks_sync_refresh', {
-                            'sync_doc_name': sync_doc_name})
+def set_warning_message(doc) -> None:
+    doc['message'] = ''
+
+    for idx, warning_code in enumerate(doc['warning_codes']):
+        if idx > 0:
+            doc['message'] += '<br>'
+
+        doc['message'] += f"- {get_warning_message(warning_code, doc['warning_data'])}"
+
+
+def get_ledger_entry(doc) -> dict:
+    return {
+        'status': doc['status'],
+        'reference_doctype': doc['doctype'],
+        'reference_name': doc['name'],
+        'message': doc.get('message')
+    }
+
+
+def set_sync_date(docs, sync_date) -> None:
+    """Stamp `winbooks_sync_date` on the synchronised documents.
+
+    Documents are grouped by doctype and stamped with one UPDATE per chunk of names. It
+    runs in the transaction of the caller so that either all the documents are stamped
+    or none of them. Unlike `frappe.db.set_value`, it does not touch `modified`.
+    """
+    names_by_doctype = {}
+
+    for doc in docs:
+        names_by_doctype.setdefault(doc['doctype'], []).append(doc['name'])
+
+    for doctype, names in names_by_doctype.items():
+        # The doctype comes from the PythaCore payload, make sure it is one we synchronise
+        # before using it as a table name.
+        if not frappe.get_meta(doctype).has_field('winbooks_sync_date'):
+            frappe.throw(_('{0} cannot be synchronised with Winbooks.').format(doctype))
+
+        for names_chunk in chunk(names):
+            frappe.db.sql(f"""
+                update `tab{doctype}`
+                set winbooks_sync_date = %s
+                where name in %s
+            """, (sync_date, tuple(names_chunk)))
+
+        if doctype in OUTBOX_DOCTYPES:
+            set_outbox_sync_date(doctype, names, sync_date)
+
+
+@frappe.whitelist()
+def get_invoices(doctype, fields, filters, limit_page_length, order_by, sync_doc_name=None):
+    with measure_phase('Winbooks Synchronisation', sync_doc_name, 'get_invoices') as metrics:
+        # We read `vat_data` in the main query instead of loading every invoice. Fields that
+        # were not requested by PythaCore are removed before returning the invoices.
+        fields, added_fields = with_extra_fields(fields, get_vat_fields(doctype))
+        invoices = frappe.db.get_all(doctype, fields=fields, filters=get_sync_filters(doctype, filters),
+                                     page_length=limit_page_length, order_by=order_by)
+
+        set_vat(doctype, invoices)
+        remove_fields(invoices, added_fields)
+
+        metrics.documents = len(invoices)
+
+    return make_response(invoices)
 
 
 @frappe.whitelist()
-def get_invoices(doctype, fields, filters, limit_page_length, order_by):
-    invoices = frappe.db.get_all(
-        doctype, fields=fields, filters=filters, page_length=limit_page_length, order_by=order_by)
+def get_invoices_page(doctype, fields, filters, cursor=None, page_length=None, sync_doc_name=None):
+    """Paginated variant of `get_invoices`, see `pythacore.utils.get_page`."""
+    with measure_phase('Winbooks Synchronisation', sync_doc_name, 'get_invoices') as metrics:
+        fields, added_fields = with_extra_fields(fields, get_vat_fields(doctype))
+        invoices, next_cursor = get_page(
+            doctype, fields, get_sync_filters(doctype, filters), cursor, page_length)
+
+        set_vat(doctype, invoices)
+        remove_fields(invoices, added_fields)
+
+        metrics.documents = len(invoices)
+
+    return make_response({'data': invoices, 'cursor': next_cursor})
+
+
+def get_vat_fields(doctype) -> list:
+    """Return the fields `set_vat` needs in the invoices it receives."""
+    if doctype in TAXES_DOCTYPES:
+        return ['name', 'vat_data']
+
+    return ['name']
+
+
+def set_vat(doctype, invoices) -> None:
+    """Set `vat_amount` and `vat_breakup` on the invoices fetched with `get_vat_fields`."""
+    if doctype not in TAXES_DOCTYPES:
+        for invoice in invoices:
+            doc = frappe.get_doc(doctype, invoice['name'])
+            invoice['vat_amount'], invoice['vat_breakup'] = old_get_vat(doc)
+
+        return
+
+    # We created a new method in order to use the `vat_data` field of Sales/Purchase Invoice.
+    # This field is calculated and set upon saving the invoice so there is no need to redo
+    # all the calculations here. Nonetheless, we are keeping the 'old way' method for
+    # backwards compatibility, with the taxes of those legacy invoices loaded in bulk.
+    legacy_names = [invoice['name']
+                    for invoice in invoices if invoice['vat_data'] is None]
+    taxes = get_taxes(doctype, legacy_names)
 
     for invoice in invoices:
-        doc = frappe.get_doc(doctype, invoice['name'])
-
-        # We created a new method in order to use the `vat_data` field of Sales/Purchase Invoice.
-        # This field is calculated and set upon saving the invoice so there is no need to redo
-        # all the calculations here. Nonetheless, we are keeping the 'old way' method for
-        # backwards compatibility.
-        if doctype in ['Sales Invoice', 'Purchase Invoice'] and doc.vat_data is not None:
-            vat_data = json.loads(doc.vat_data)
+        if invoice['vat_data'] is not None:
+            vat_data = json.loads(invoice['vat_data'])
             total_vat = vat_data['total_vat_amount']
             vat_breakup = vat_data['vat_code_breakup']
         else:
-            total_vat, vat_breakup = old_get_vat(doc)
+            total_vat, vat_breakup = get_vat_from_taxes(
+                taxes.get(invoice['name'], []))
 
         invoice['vat_amount'] = total_vat
         invoice['vat_breakup'] = vat_breakup
 
-    return invoices
+
+def get_taxes(doctype, names) -> dict:
+    """Return the tax rows of the given invoices, grouped by invoice name."""
+    taxes = {}
+
+    for names_chunk in chunk(names):
+        rows = frappe.db.get_all(
+            TAXES_DOCTYPES[doctype],
+            fields=['parent', 'tax_type', 'item_wise_tax_detail'],
+            filters={'parenttype': doctype, 'parentfield': 'taxes',
+                     'parent': ['in', names_chunk]},
+            order_by='idx asc')
+
+        for row in rows:
+            taxes.setdefault(row['parent'], []).append(row)
+
+    return taxes
 
 # Keep this for backwards compatibility.
 def old_get_vat(doc):
+    return get_vat_from_taxes(doc.taxes)
+
+
+def get_vat_from_taxes(taxes):
     vat_breakup = {}
     total_vat_amount = 0
 
-    for tax in doc.taxes:
+    for tax in taxes:
         if tax.tax_type == 'VAT':
             item_tax_map = json.loads(
                 tax.item_wise_tax_detail) if tax.item_wise_tax_detail else {}
@@ -305,75 +523,80 @@ def old_get_vat(doc):
 
 
 @frappe.whitelist()
-def get_all_customers(fields, filters, limit_page_length):
-    customers = frappe.db.get_all(
-        'Customer', fields=fields, filters=filters, page_length=limit_page_length)
+def get_all_customers(fields, filters, limit_page_length, changed_only=0, sync_doc_name=None):
+    with measure_phase('Winbooks Synchronisation', sync_doc_name, 'get_all_customers') as metrics:
+        # In `changed_only` mode, customers are also sent again when they or their addresses
+        # and contacts changed since their last synchronisation.
+        if cint(changed_only):
+            customers = get_changed_parties('Customer', fields, filters, limit_page_length)
+        else:
+            customers = frappe.db.get_all(
+                'Customer', fields=fields, filters=get_sync_filters('Customer', filters), page_length=limit_page_length)
+
+        set_addresses_and_contacts(customers, 'Customer')
 
-    for customer in customers:
-        links = frappe.db.get_all('Dynamic Link', {
-                                  'link_doctype': 'Customer', 'link_name': customer['name'], 'parenttype': 'Address'}, ['parent'])
-        customer.addresses = []
+        metrics.documents = len(customers)
 
-        for link in links:
-            address = frappe.db.get_value("Address", link['parent'], fieldname=[
-                                          'name', 'address_line1', 'address_line2', 'city', 'pincode', 'country', 'address_type', 'fs_code'], as_dict=True)
-            address['customer'] = customer['name']
-            customer.addresses.append(address)
+    return make_response(customers)
 
-        links = frappe.db.get_all('Dynamic Link', {
-                                  'link_doctype': 'Customer', 'link_name': customer['name'], 'parenttype': 'Contact'}, ['parent'])
-        customer.contacts = []
 
-        for link in links:
-            contact = frappe.db.get_value("Contact", link['parent'], fieldname=[
-                                          'first_name', 'last_name', 'email_id', 'phone', 'is_primary_contact'], as_dict=True)
-            contact['customer'] = customer['name']
+@frappe.whitelist()
+def get_all_customers_page(fields, filters, cursor=None, page_length=None, changed_only=0, sync_doc_name=None):
+    """Paginated variant of `get_all_customers`, see `pythacore.utils.get_page`."""
+    with measure_phase('Winbooks Synchronisation', sync_doc_name, 'get_all_customers') as metrics:
+        fields, added_fields = with_extra_fields(fields, ['name'])
+
+        if cint(changed_only):
+            customers, next_cursor = get_changed_parties_page(
+                'Customer', fields, filters, cursor, page_length)
+        else:
+            customers, next_cursor = get_page(
+                'Customer', fields, get_sync_filters('Customer', filters), cursor, page_length)
 
-            for part in contact:
-                if contact[part] is None:
-                    contact[part] = ''
+        set_addresses_and_contacts(customers, 'Customer')
+        remove_fields(customers, added_fields)
 
-            customer.contacts.append(contact)
+        metrics.documents = len(customers)
 
-    return customers
+    return make_response({'data': customers, 'cursor': next_cursor})
 
 # We need a custom method in order to fetch linked docs such as the supplier's addresses
 
 
 @frappe.whitelist()
-def get_all_suppliers(fields, filters, limit_page_length):
-    suppliers = frappe.db.get_all(
-        'Supplier', fields=fields, filters=filters, page_length=limit_page_length)
-
-    for supplier in suppliers:
-        links = frappe.db.get_all('Dynamic Link', {
-                                  'link_doctype': 'Supplier', 'link_name': supplier['name'], 'parenttype': 'Address'}, ['parent'])
-        supplier.addresses = []
+def get_all_suppliers(fields, filters, limit_page_length, changed_only=0, sync_doc_name=None):
+    with measure_phase('Winbooks Synchronisation', sync_doc_name, 'get_all_suppliers') as metrics:
+        # In `changed_only` mode, suppliers are also sent again when they or their addresses
+        # and contacts changed since their last synchronisation.
+        if cint(changed_only):
+            suppliers = get_changed_parties('Supplier', fields, filters, limit_page_length)
+        else:
+            suppliers = frappe.db.get_all(
+                'Supplier', fields=fields, filters=get_sync_filters('Supplier', filters), page_length=limit_page_length)
 
-        for link in links:
-            address = frappe.db.get_value("Address", link['parent'], fieldname=[
-                                          'name', 'address_line1', 'address_line2', 'city', 'pincode', 'country', 'address_type', 'fs_code'], as_dict=True)
-            address['supplier'] = supplier['name']
+        set_addresses_and_contacts(suppliers, 'Supplier', blank_addresses=True)
 
-            for part in address:
-                if address[part] is None:
-                    address[part] = ''
+        metrics.documents = len(suppliers)
 
-            supplier.addresses.append(address)
+    return make_response(suppliers)
 
-        links = frappe.db.get_all('Dynamic Link', {
-                                  'link_doctype': 'Supplier', 'link_name': supplier['name'], 'parenttype': 'Contact'}, ['parent'])
-        supplier.contacts = []
 
-        for link in links:
-            contact = frappe.db.get_value("Contact", link['parent'], fieldname=[
-                                          'first_name', 'last_name', 'email_id', 'phone', 'is_primary_contact'], as_dict=True)
-            contact['supplier'] = supplier['name']
+@frappe.whitelist()
+def get_all_suppliers_page(fields, filters, cursor=None, page_length=None, changed_only=0, sync_doc_name=None):
+    """Paginated variant of `get_all_suppliers`, see `pythacore.utils.get_page`."""
+    with measure_phase('Winbooks Synchronisation', sync_doc_name, 'get_all_suppliers') as metrics:
+        fields, added_fields = with_extra_fields(fields, ['name'])
+
+        if cint(changed_only):
+            suppliers, next_cursor = get_changed_parties_page(
+                'Supplier', fields, filters, cursor, page_length)
+        else:
+            suppliers, next_cursor = get_page(
+                'Supplier', fields, get_sync_filters('Supplier', filters), cursor, page_length)
 
-            for part in contact:
-                if contact[part] is None:
-                    contact[part] = ''
+        set_addresses_and_contacts(suppliers, 'Supplier', blank_addresses=True)
+        remove_fields(suppliers, added_fields)
 
-            supplier.contacts.append(contact)
+        metrics.documents = len(suppliers)
 
-    return suppliers
+    return make_response({'data': suppliers, 'cursor': next_cursor})
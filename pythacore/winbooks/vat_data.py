@@ -0,0 +1,110 @@
+# System imports
+import json
+
+# Frappe imports
+import frappe
+from frappe import _
+from frappe.utils.background_jobs import enqueue
+
+# Local imports
+from pythacore.utils import (SYNC_JOB_TIMEOUT, acquire_sync_lock, acquire_sync_slot, get_sync_queue,
+                             release_sync_lock, release_sync_slot)
+from pythacore.winbooks.doctype.winbooks_synchronisation.winbooks_synchronisation import (
+    TAXES_DOCTYPES, get_taxes, get_vat_from_taxes)
+
+# How many invoices are processed, then committed, at once by the backfill.
+BACKFILL_CHUNK_SIZE = 500
+
+# Name of the lock held while the backfill is queued or running, and of the
+# synchronisation slot it takes while it runs.
+BACKFILL_NAME = 'vat_data_backfill'
+
+
+@frappe.whitelist()
+def start_backfill() -> bool:
+    frappe.only_for('System Manager')
+
+    # The lock is released by `backfill_vat_data` once the job is done.
+    if not acquire_sync_lock(BACKFILL_NAME):
+        return False
+
+    try:
+        enqueue(
+            backfill_vat_data,
+            queue=get_sync_queue(),
+            timeout=SYNC_JOB_TIMEOUT,
+            event='vat_data_backfill',
+            job_name=BACKFILL_NAME
+        )
+    except Exception:
+        release_sync_lock(BACKFILL_NAME)
+        raise
+
+    return True
+
+
+@frappe.whitelist()
+def get_missing_vat_data_report() -> dict:
+    """Return how many submitted invoices still have no `vat_data`, by doctype."""
+    frappe.only_for('System Manager')
+
+    return {doctype: frappe.db.count(doctype, get_missing_vat_data_filters()) for doctype in TAXES_DOCTYPES}
+
+
+def backfill_vat_data(chunk_size=BACKFILL_CHUNK_SIZE) -> None:
+    """Compute and store `vat_data` for the submitted invoices which don't have it yet.
+
+    This is the data `get_invoices` would otherwise compute from the taxes of these
+    legacy invoices on every export. Every chunk is committed and only invoices without
+    `vat_data` are selected, so the job resumes where it stopped if it is run again.
+    """
+    try:
+        # The backfill counts as one of the concurrent synchronisations for its whole run.
+        if not acquire_sync_slot(BACKFILL_NAME):
+            frappe.throw(_('Too many synchronisations are running. Please try again later.'),
+                         title=_('Synchronisation Busy'))
+
+        try:
+            backfill_doctypes(chunk_size)
+        finally:
+            release_sync_slot(BACKFILL_NAME)
+    finally:
+        release_sync_lock(BACKFILL_NAME)
+
+
+def backfill_doctypes(chunk_size) -> None:
+    for doctype in TAXES_DOCTYPES:
+        last_name = ''
+
+        while True:
+            names = frappe.db.get_all(
+                doctype,
+                filters=get_missing_vat_data_filters() + [['name', '>', last_name]],
+                order_by='name asc',
+                page_length=chunk_size,
+                pluck='name'
+            )
+
+            if len(names) == 0:
+                break
+
+            taxes = get_taxes(doctype, names)
+
+            for name in names:
+                total_vat, vat_breakup = get_vat_from_taxes(taxes.get(name, []))
+                vat_data = json.dumps({
+                    'total_vat_amount': total_vat,
+                    'vat_code_breakup': vat_breakup
+                })
+
+                frappe.db.set_value(doctype, name, 'vat_data', vat_data, update_modified=False)
+
+            frappe.db.commit()
+            last_name = names[-1]
+
+
+def get_missing_vat_data_filters() -> list:
+    return [
+        ['docstatus', '=', 1],
+        ['vat_data', 'is', 'not set']
+    ]
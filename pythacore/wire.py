@@ -0,0 +1,185 @@
+# System imports
+import gzip
+import io
+import json
+import zlib
+
+# Frappe imports
+import frappe
+from frappe import _
+from frappe.utils import cint
+from frappe.utils.response import json_handler
+from werkzeug.wrappers import Response
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Set to `columnar` by the clients which want lists of records as field names and rows.
+FORMAT_HEADER = 'X-PythaCore-Format'
+COLUMNAR_FORMAT = 'columnar'
+
+# A columnar list is encoded as {COLUMNS_KEY: [field, ...], ROWS_KEY: [[value, ...], ...]}.
+COLUMNS_KEY = '__columns__'
+ROWS_KEY = 'rows'
+
+# Smaller responses are not worth compressing.
+COMPRESSION_MIN_SIZE = 1024
+
+# Maximum size of a decompressed request body, in bytes, unless `pythacore_max_payload_size`
+# is set in the site config.
+DEFAULT_MAX_PAYLOAD_SIZE = 64 * 1024 * 1024
+
+
+def read_payload():
+    """Return the parsed body of the request PythaCore sent to a callback.
+
+    The body may be compressed, with its `Content-Encoding` set to `gzip` or `zstd`. Since
+    Frappe parses `application/json` bodies itself, compressed bodies must be sent with
+    another content type, such as `application/octet-stream`. Columnar lists are decoded
+    back into lists of dicts wherever they appear in the payload.
+    """
+    return parse_payload(get_request_body())
+
+
+def get_request_body() -> bytes:
+    """Return the body of the request, decompressed."""
+    body = frappe.request.get_data()
+    encoding = (frappe.request.headers.get('Content-Encoding') or '').strip().lower()
+
+    if encoding in ('', 'identity'):
+        return body
+
+    return decompress(body, encoding, get_max_payload_size())
+
+
+def decompress(body, encoding, max_size) -> bytes:
+    """Decompress `body` as a stream, and fail once it exceeds `max_size` bytes.
+
+    The body comes from the request, so it is never fully decompressed before its size
+    is checked: a small body could expand to gigabytes.
+    """
+    if encoding == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+        try:
+            data = decompressor.decompress(body, max_size + 1)
+        except zlib.error:
+            frappe.throw(_('Invalid gzip request body.'))
+    elif encoding == 'zstd' and zstandard is not None:
+        reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body))
+        data = bytearray()
+
+        try:
+            while len(data) <= max_size:
+                chunk = reader.read(max_size + 1 - len(data))
+
+                if not chunk:
+                    break
+
+                data += chunk
+        except zstandard.ZstdError:
+            frappe.throw(_('Invalid zstd request body.'))
+    else:
+        frappe.throw(_('Unsupported content encoding: {0}').format(encoding))
+
+    if len(data) > max_size:
+        frappe.throw(_('The request body is larger than {0} bytes once decompressed.').format(max_size))
+
+    return bytes(data)
+
+
+def get_max_payload_size() -> int:
+    return cint(frappe.conf.get('pythacore_max_payload_size')) or DEFAULT_MAX_PAYLOAD_SIZE
+
+
+def parse_payload(body):
+    return decode_columns(json.loads(body))
+
+
+def make_response(data):
+    """Return `data` in the format and with the compression negotiated by the request.
+
+    Without a `X-PythaCore-Format: columnar` header, lists keep the usual format. Without
+    a compression in `Accept-Encoding`, or outside of a request, `data` is returned as is
+    for Frappe to build its usual JSON response.
+    """
+    request = getattr(frappe.local, 'request', None)
+
+    if request is None:
+        return data
+
+    columnar = (request.headers.get(FORMAT_HEADER) or '').strip().lower() == COLUMNAR_FORMAT
+    encoding = request.accept_encodings.best_match(get_supported_encodings())
+
+    if not columnar and not encoding:
+        return data
+
+    if columnar:
+        data = encode_columns(data)
+
+    body = json.dumps({'message': data}, default=json_handler, separators=(',', ':')).encode()
+    response = Response(content_type='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+
+    if encoding and len(body) >= COMPRESSION_MIN_SIZE:
+        body = compress(body, encoding)
+        response.headers['Content-Encoding'] = encoding
+
+    response.set_data(body)
+
+    return response
+
+
+def get_supported_encodings() -> list:
+    return ['zstd', 'gzip'] if zstandard is not None else ['gzip']
+
+
+def compress(body, encoding) -> bytes:
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor().compress(body)
+
+    return gzip.compress(body, compresslevel=6)
+
+
+def encode_columns(value):
+    """Encode the lists of dicts in `value` as field names followed by rows of values.
+
+    Only the lists whose dicts all have the same keys are encoded, so that `decode_columns`
+    gives back the same dicts. Other lists keep the usual format.
+    """
+    if isinstance(value, dict):
+        return {key: encode_columns(item) for key, item in value.items()}
+
+    if not isinstance(value, list):
+        return value
+
+    if len(value) == 0 or not all(isinstance(item, dict) for item in value):
+        return [encode_columns(item) for item in value]
+
+    columns = list(value[0])
+
+    # A record without one of the keys would be decoded with `None` for it.
+    if any(record.keys() != value[0].keys() for record in value):
+        return [encode_columns(record) for record in value]
+
+    return {
+        COLUMNS_KEY: columns,
+        ROWS_KEY: [[encode_columns(record.get(column)) for column in columns] for record in value]
+    }
+
+
+def decode_columns(value):
+    """Decode the columnar lists of `value` back into lists of dicts."""
+    if isinstance(value, list):
+        return [decode_columns(item) for item in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    if COLUMNS_KEY in value:
+        columns = value[COLUMNS_KEY]
+        return [dict(zip(columns, [decode_columns(item) for item in row])) for row in value[ROWS_KEY]]
+
+    return {key: decode_columns(item) for key, item in value.items()}